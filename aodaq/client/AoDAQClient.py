@@ -1,81 +1,297 @@
 import os
-import re
-import json
 import time
 import socket
 import logging
-import requests
+import numpy as np
 from datetime import datetime
-from calibration import apply_calibrated_model
+import uploads
+from autogain import GainCache, choose_gain, gain_key
+from averaging import DEFAULT_NOISE_TOLERANCE, MIN_BLOCKS, SpectrumAverager
+from calibration import load_calibration_model
+from polling import CompletionPoller, ScanRateEstimator, scan_key
+from spectrum_parser import SpectrumStreamParser
+from timing import TimingRecorder
+from protocol import FRAMING_LEGACY, FRAMING_MODE, LineBuffer, ResponseFramer, extract_value_after_ok
+from uploads import PREDICTION_UPLOAD_URL, SPECTRUM_UPLOAD_URL, UPLOAD_BINARY
 
 # --- Configuration ---
 RESPONSE_BUFFER_SIZE = 65536
 INIT_TIMEOUT = 5.0
 SPECTRUM_TIMEOUT = 60.0 * 2 # minutes
-COMMAND_DELAY = 0.5
+COMMAND_DELAY = 0.5  # Only used in legacy framing mode
 RETRY_ATTEMPTS = 5
 VALIDATE_RESP_OK = ["OK", "ARCspectro"]
+DEVICE_NAME = "simulated-pi"
+CALIBRATION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calibration_coeffs.csv")
+
+GAIN_MAP = {"Low": 0, "Medium": 1, "High": 2, "Extreme": 3}
+AUTO_GAIN = "Auto"  # gain_level that picks the gain from probe scans (see select_gain)
+SATURATION_THRESHOLD = 0.9
+PROBE_AVERAGES = 2  # averages per auto-gain probe scan
+APO_MAP = {
+    "Boxcar": 0, "NortonBeerWeak": 1, "NortonBeerMedium": 2,
+    "NortonBeerStrong": 3, "Hamming": 4, "BlackmanHarris3": 5,
+    "BlackmanHarris4": 6, "Triangular": 7, "Hann": 8,
+    "Tukey": 9, "Cosine": 10, "HappGenzel": 11
+}
+SETUP_COMMANDS = [
+    "TRAN:LEN 1",
+    "TRAN:BIN 0",
+    "TRAN:SABS 1",
+    "SPEC:WLG 1",  # wavelength mode
+]
 
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 
+def settings_commands(gain_level, apodization, num_averages, is_igm_avg=False):
+    """Returns the commands that apply one set of acquisition settings, in order."""
+    if gain_level == AUTO_GAIN:
+        # GAIN_MAP has no "Auto"; sending Low would mislabel the data as Gain-Auto
+        raise ValueError(f"gain_level {AUTO_GAIN!r} must be resolved to a GAIN_MAP level first (see select_gain)")
+    commands = [
+        f"GAIN:SET {GAIN_MAP.get(gain_level, 0)}",
+        f"SPEC:APO {APO_MAP.get(apodization, 3)}",
+        f"SPEC:AVG {num_averages}",  # spectrum averaging
+    ]
+    # Interferogram averaging; always sent so turning it off also resets a device left averaging
+    commands.append(f"IFGM:AVG {num_averages if is_igm_avg else 1}")
+    return commands
+
+
+def make_device_id_tag(gain_level, apodization, num_averages, message="", device_name=DEVICE_NAME):
+    """Encodes the acquisition settings into the device_id string stored with each spectrum."""
+    return "{0}_Gain-{1}_Apo-{2}_Avg-{3}_'{4}'".format(
+        device_name, gain_level, apodization, num_averages, message
+    )
+
+
+def make_acquisition_fields(gain_level, apodization, num_averages, message="", saturation=None, device_name=DEVICE_NAME):
+    """The acquisition settings as the structured fields stored with each spectrum by the API."""
+    fields = {
+        "device": device_name,
+        "gain": gain_level,
+        "apodization": apodization,
+        "averages": int(num_averages),
+        "note": message,
+    }
+    if saturation is not None:
+        fields["saturation"] = float(saturation)
+    return fields
+
+
 class AoDAQClient:
-    def __init__(self, host, port):
+    def __init__(self, host, port, framing=FRAMING_MODE, spool=None, timing=None, scan_rates=None, gain_cache=None):
         self.host = host
         self.port = port
         self.sock = None
+        self.framing = framing
+        # Optional spool.UploadSpool; if set, results are queued instead of uploaded inline
+        self.spool = spool
+        # Per-command and per-phase timings (timing.TimingRecorder); pass one with a path to log them
+        self.timing = timing if timing is not None else TimingRecorder()
+        # Time per average by settings (polling.ScanRateEstimator), used to schedule MEAS:REM? polls
+        self.scan_rates = scan_rates if scan_rates is not None else ScanRateEstimator()
+        self._scan = None  # (scan_key, averages) of the last configured settings
+        # Gains chosen in AUTO_GAIN mode by device / sample type (autogain.GainCache)
+        self.gain_cache = gain_cache if gain_cache is not None else GainCache()
+        self._lines = LineBuffer()
+        # Settings applied on the current connection, keyed by command name (e.g. "GAIN:SET")
+        self._applied_settings = {}
+        self._setup_applied = False
 
 
     def connect(self, timeout=10.0):
         logging.info(f"Connecting to AoDAQ at {self.host}:{self.port}...")
         self.sock = socket.create_connection((self.host, self.port), timeout=timeout)
+        self._lines.clear()
+        self._applied_settings = {}
+        self._setup_applied = False
         logging.info("✅ Connected.")
 
 
     def close(self):
         if self.sock:
             self.sock.close()
+            self.sock = None
             logging.info("Connection closed.")
 
 
+    def _read_until_timeout(self, timeout, on_chunk, timer=None):
+        """Legacy read: keep receiving until the socket stays silent for `timeout` seconds."""
+        received = 0
+        self.sock.settimeout(timeout)
+        while True:
+            try:
+                chunk = self.sock.recv(RESPONSE_BUFFER_SIZE)
+                if not chunk:
+                    break
+                received += len(chunk)
+                if timer:
+                    timer.received(len(chunk))
+                on_chunk(chunk)
+            except socket.timeout:
+                break
+        return received
+
+
+    def _read_framed(self, framer, timeout, on_line=None, timer=None):
+        """
+        Feeds reply lines to the framer until it reports the reply complete, the stream goes idle
+        after the first line, or `timeout` expires. Returns the number of bytes received.
+        Commands are sent one at a time, so anything still buffered once the reply is complete
+        is a stray or late reply and is dropped rather than read as the next command's.
+        """
+        received = 0
+        deadline = time.monotonic() + timeout
+
+        def consume_buffered():
+            line = self._lines.next_line()
+            while line is not None:
+                if on_line:
+                    on_line(line)
+                if framer.feed_line(line):
+                    return True
+                line = self._lines.next_line()
+            return False
+
+        while not consume_buffered():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            wait = min(remaining, framer.idle_timeout) if framer.lines_seen else remaining
+            self.sock.settimeout(wait)
+            try:
+                chunk = self.sock.recv(RESPONSE_BUFFER_SIZE)
+            except socket.timeout:
+                if framer.lines_seen:
+                    break  # reply went idle without the expected terminator
+                continue
+            if not chunk:
+                break
+            received += len(chunk)
+            if timer:
+                timer.received(len(chunk))
+            self._lines.feed(chunk)
+
+        if not framer.complete:
+            partial = self._lines.take_partial()
+            if partial:
+                if on_line:
+                    on_line(partial)
+                framer.feed_line(partial)
+        else:
+            stray = self._lines.take_partial()
+            if stray:
+                logging.warning(f"Dropping {len(stray)} unexpected bytes after the reply to {framer.command}")
+        return received
+
+
+    def _discard_pending(self):
+        """Drops buffered and in-flight bytes so a late reply is not read as the next one."""
+        self._lines.clear()
+        self.sock.settimeout(0.05)
+        try:
+            while self.sock.recv(RESPONSE_BUFFER_SIZE):
+                pass
+        except (socket.timeout, BlockingIOError):
+            pass
+
+
     def send_command(self, command, timeout=INIT_TIMEOUT, delay=COMMAND_DELAY, expect_ok=False) -> str:
+        timer = self.timing.command(command)
         for attempt in range(RETRY_ATTEMPTS):
             try:
                 logging.info(f"→ {command}")
                 self.sock.sendall((command + "\n").encode())
-                time.sleep(delay)
-                self.sock.settimeout(timeout)
-
-                response_parts = []
-                while True:
-                    try:
-                        chunk = self.sock.recv(RESPONSE_BUFFER_SIZE)
-                        if not chunk:
-                            break
-                        response_parts.append(chunk)
-                    except socket.timeout:
-                        break
-
-                response = b"".join(response_parts).decode("utf-8", errors="replace").strip()
+                timer.sent()
+
+                if self.framing == FRAMING_LEGACY:
+                    self.timing.sleep(delay, "command_delay")
+                    response_parts = []
+                    self._read_until_timeout(timeout, response_parts.append, timer)
+                    response = b"".join(response_parts).decode("utf-8", errors="replace").strip()
+                else:
+                    framer = ResponseFramer(command)
+                    self._read_framed(framer, timeout, timer=timer)
+                    response = framer.text()
+
                 if len(response) > 200:
                     logging.info(f"← (received {len(response)} chars)")
                 else:
                     logging.info(f"← {response}")
 
                 if not expect_ok or any(ok in response for ok in VALIDATE_RESP_OK):
+                    self.timing.finish(timer, ok=bool(response))
                     return response
                 else:
                     logging.warning(f"Unexpected response, retrying... [{attempt+1}/{RETRY_ATTEMPTS}]")
-                    time.sleep(1)
+                    timer.retry()
+                    self.timing.sleep(1, "retry")
+                    if self.framing != FRAMING_LEGACY:
+                        self._discard_pending()
 
             except (socket.timeout, socket.error) as e:
                 logging.warning(f"Attempt {attempt+1} failed: {e}")
-                time.sleep(1)
+                timer.retry()
+                self.timing.sleep(1, "retry")
 
         logging.error(f"Failed to send command after {RETRY_ATTEMPTS} attempts: {command}")
+        self.timing.finish(timer, ok=False)
         return ""
 
 
+    def fetch_spectrum(self, timeout=SPECTRUM_TIMEOUT, delay=COMMAND_DELAY):
+        """
+        Sends TRAN:SPEC? and parses the reply while it streams in.
+
+        Returns:
+            np.ndarray: (N x 2) array of (wavelength, intensity) rows, empty if nothing parsed.
+        """
+        command = "TRAN:SPEC?"
+        timer = self.timing.command(command)
+        for attempt in range(RETRY_ATTEMPTS):
+            parser = SpectrumStreamParser()
+            try:
+                logging.info(f"→ {command}")
+                self.sock.sendall((command + "\n").encode())
+                timer.sent()
+
+                expected = None
+                if self.framing == FRAMING_LEGACY:
+                    self.timing.sleep(delay, "command_delay")
+                    received = self._read_until_timeout(timeout, parser.feed, timer)
+                    parser.close()
+                else:
+                    framer = ResponseFramer(command)
+                    received = self._read_framed(framer, timeout, on_line=parser.parse_line, timer=timer)
+                    expected = framer.expected_points
+
+                logging.info(f"← (received {received} bytes, {len(parser)} points)")
+                if expected is not None and 0 < len(parser) < expected:
+                    logging.warning(f"Spectrum cut short: {len(parser)} of {expected} points, retrying... "
+                                    f"[{attempt+1}/{RETRY_ATTEMPTS}]")
+                elif len(parser):
+                    self.timing.finish(timer, ok=True)
+                    return parser.spectrum()
+                else:
+                    logging.warning(f"No spectrum points in response {parser.header_lines}, retrying... "
+                                    f"[{attempt+1}/{RETRY_ATTEMPTS}]")
+                timer.retry()
+                self.timing.sleep(1, "retry")
+                if self.framing != FRAMING_LEGACY:
+                    self._discard_pending()
+
+            except (socket.timeout, socket.error) as e:
+                logging.warning(f"Attempt {attempt+1} failed: {e}")
+                timer.retry()
+                self.timing.sleep(1, "retry")
+
+        logging.error(f"Failed to send command after {RETRY_ATTEMPTS} attempts: {command}")
+        self.timing.finish(timer, ok=False)
+        return np.empty((0, 2))
+
+
     def parse_spectrum_data(self, response: str):
         lines = response.splitlines()
         spectrum = []
@@ -106,176 +322,282 @@ class AoDAQClient:
             logging.error(f"Error saving spectrum: {e}")
             
             
-    def upload_spectrum(self, spectrum, api_url, device_id="pi-01"):
+    def upload_spectrum(self, spectrum, api_url=SPECTRUM_UPLOAD_URL, device_id="pi-01", binary=UPLOAD_BINARY,
+                        predicted_value=None, model_version=None, acquisition=None):
         """
-        Upload the given spectrum data to the Django API.
+        Upload the given spectrum data, optionally with its prediction and acquisition settings,
+        to the Django API. See uploads.upload_spectrum.
         """
-        wavelengths, intensities = zip(*spectrum)  # unzip the list of tuples
+        return uploads.upload_spectrum(spectrum, api_url, device_id=device_id, binary=binary,
+                                       predicted_value=predicted_value, model_version=model_version,
+                                       acquisition=acquisition)
 
-        payload = {
-            "wavelengths": list(wavelengths),
-            "intensities": list(intensities),
-            "device_id": device_id
-        }
-        headers = {"Content-Type": "application/json"}
 
-        try:
-            response = requests.post(api_url, data=json.dumps(payload), headers=headers)
-            if response.status_code == 201:
-                logging.info("✅ Spectrum uploaded successfully to API.")
-                spectrum_id = response.json().get("spectrum_id")
-                return spectrum_id
-            else:
-                logging.error(f"❌ Failed to upload spectrum. Status: {response.status_code}, Response: {response.text}")
-        except Exception as e:
-            logging.error(f"⚠️ Exception during spectrum upload: {e}")
+    def upload_prediction(self, predicted_value, spectrum_id, device_id, api_url=PREDICTION_UPLOAD_URL):
+        """
+        Uploads a predicted SOC value to the Django API. See uploads.upload_prediction.
+        """
+        return uploads.upload_prediction(predicted_value, spectrum_id, device_id, api_url)
+
 
-        return None
-    
-    
-    def upload_prediction(self, predicted_value, spectrum_id, device_id, api_url):
+    def extract_value_after_ok(self, response: str, as_type=int):
         """
-        Uploads a predicted SOC value to the Django API.
+        Parses the second line after 'OK' in a multi-line AoDAQ response,
+        cleans non-numeric characters, and casts to the given type.
+        """
+        return extract_value_after_ok(response, as_type)
+
 
-        Args:
-            predicted_value (float): The predicted SOC value.
-            spectrum_id (str): UUID of the associated spectrum.
-            device_id (str): Identifier of the device used to capture the spectrum.
-            api_url (str): Full URL to the prediction upload endpoint.
+    def is_ready(self) -> bool:
+        """Checks *IDN? and that STAT:INIT? reports initialisation finished."""
+        self.send_command("*IDN?", expect_ok=True)
+        status = self.send_command("STAT:INIT?", expect_ok=True)
+        return "0" in status
+
+
+    def configure(self, gain_level="Low", apodization="NortonBeerStrong", num_averages=5, is_igm_avg=False):
+        """
+        Applies acquisition settings. The transfer setup is sent once per connection and a
+        setting is only re-sent if it differs from what was last applied on this connection.
 
         Returns:
-            bool: True if upload successful, False otherwise.
+            list[str]: The commands actually sent.
         """
-        payload = {
-            "device_id": device_id,
-            "predicted_value": predicted_value,
-            "spectrum": spectrum_id
-        }
+        commands = [] if self._setup_applied else list(SETUP_COMMANDS)
+        for command in settings_commands(gain_level, apodization, num_averages, is_igm_avg):
+            if self._applied_settings.get(command.split()[0]) != command:
+                commands.append(command)
 
-        headers = {"Content-Type": "application/json"}
+        for command in commands:
+            if self.send_command(command, expect_ok=True):
+                self._applied_settings[command.split()[0]] = command
+        self._setup_applied = True
+        self._scan = (scan_key(gain_level, apodization, num_averages, is_igm_avg), num_averages)
+        return commands
 
-        try:
-            response = requests.post(api_url, json=payload, headers=headers)
-            if response.status_code == 201:
-                logging.info("✅ Predicted value uploaded to API.")
-                return True
+
+    def wait_for_completion(self, started=None):
+        """
+        Polls MEAS:REM? until the device reports no measurements remaining. Between polls it
+        sleeps until the predicted end of the measurement started at `started`
+        (time.monotonic()), then polls tightly; see polling.py.
+        """
+        key, averages = self._scan or (None, 1)
+        prior = self.scan_rates.seconds_per_average(key) if key else None
+        poller = CompletionPoller(averages, time.monotonic() if started is None else started, prior)
+        while True:
+            rem = self.send_command("MEAS:REM?", expect_ok=True)
+            remaining = self.extract_value_after_ok(rem, int)
+
+            if remaining is not None:
+                logging.info(f"Remaining measurements: {remaining}")
+                if remaining == 0:
+                    # A measurement already finished at the first poll says nothing about its duration
+                    if key and poller.polls:
+                        self.scan_rates.update(key, poller.seconds_per_average())
+                    break
             else:
-                logging.error(f"❌ Prediction upload failed: {response.status_code} - {response.text}")
-        except Exception as e:
-            logging.error(f"⚠️ Error uploading predicted value: {e}")
+                logging.warning(f"Couldn't parse MEAS:REM? response: {rem}")
+                break
 
-        return False
+            self.timing.sleep(poller.next_delay(remaining), "poll")
 
-    
-    def extract_value_after_ok(self, response: str, as_type=int):
-        """
-        Parses the second line after 'OK' in a multi-line AoDAQ response,
-        cleans non-numeric characters, and casts to the given type.
+
+    def acquire_spectrum(self):
         """
-        lines = response.splitlines()
-        for idx, line in enumerate(lines):
-            if "OK" in line and idx + 2 < len(lines):
-                val = lines[idx + 2].strip()
-                val_clean = re.sub(r"[^\d.eE+-]", "", val)
-                try:
-                    return as_type(val_clean)
-                except ValueError:
-                    logging.warning(f"Failed to cast value: {val_clean}")
-                    return None
-        return None
-                            
-            
-    def run_full_matlab_equivalent(self, gain_level="Low", apodization="NortonBeerStrong", num_averages=5, is_igm_avg=False, message=""):
-        GAIN_MAP = {"Low": 0, "Medium": 1, "High": 2, "Extreme": 3}
-        APO_MAP = {
-            "Boxcar": 0, "NortonBeerWeak": 1, "NortonBeerMedium": 2,
-            "NortonBeerStrong": 3, "Hamming": 4, "BlackmanHarris3": 5,
-            "BlackmanHarris4": 6, "Triangular": 7, "Hann": 8,
-            "Tukey": 9, "Cosine": 10, "HappGenzel": 11
-        }
+        Starts an acquisition with the current settings, waits for it and retrieves the result.
 
-        try:
-            self.send_command("*IDN?", expect_ok=True)
-            status = self.send_command("STAT:INIT?", expect_ok=True)
-            if "0" not in status:
-                logging.warning("Device is still initializing. Exiting.")
-                return
-
-            self.send_command("TRAN:LEN 1", expect_ok=True)
-            self.send_command("TRAN:BIN 0", expect_ok=True)
-            self.send_command("TRAN:SABS 1", expect_ok=True)
-            self.send_command("SPEC:WLG 1", expect_ok=True)  # wavelength mode
-            
-            # Set gain
-            gain_val = GAIN_MAP.get(gain_level, 0)
-            self.send_command(f"GAIN:SET {gain_val}", expect_ok=True)
+        Returns:
+            (np.ndarray, float): The (N x 2) spectrum and the detector saturation (or None).
+        """
+        # Start acquisition
+        self.send_command("SPEC:GET?", expect_ok=True)
+        started = time.monotonic()
 
-            # Set apodization
-            apo_val = APO_MAP.get(apodization, 3)
-            self.send_command(f"SPEC:APO {apo_val}", expect_ok=True)
+        # Wait for completion
+        with self.timing.phase("wait"):
+            self.wait_for_completion(started)
 
-            # Set spectrum averaging
-            self.send_command(f"SPEC:AVG {num_averages}", expect_ok=True)
+        # Check saturation
+        sat = self.send_command("SPEC:SAT?", expect_ok=True)
+        saturation = self.extract_value_after_ok(sat, float)
 
-            # Optional: Set interferogram averaging
-            if is_igm_avg:
-                self.send_command(f"IFGM:AVG {num_averages}", expect_ok=True)
+        if saturation is not None:
+            if saturation > SATURATION_THRESHOLD:
+                logging.warning("⚠️ Detector saturation detected.")
 
-            # Start acquisition
-            self.send_command("SPEC:GET?", expect_ok=True)
+        # Retrieve spectrum
+        with self.timing.phase("fetch"):
+            spectrum = self.fetch_spectrum(timeout=SPECTRUM_TIMEOUT)
+        return spectrum, saturation
 
-            # Wait for completion
-            while True:
-                rem = self.send_command("MEAS:REM?", expect_ok=True)
-                remaining = self.extract_value_after_ok(rem, int)
 
-                if remaining is not None:
-                    logging.info(f"Remaining measurements: {remaining}")
-                    if remaining == 0:
-                        break
-                else:
-                    logging.warning(f"Couldn't parse MEAS:REM? response: {rem}")
-                    break
+    def probe_saturation(self, gain_level, apodization, probe_averages=PROBE_AVERAGES, is_igm_avg=False):
+        """Runs a short measurement at the given gain and returns its SPEC:SAT? without fetching the spectrum."""
+        self.configure(gain_level, apodization, probe_averages, is_igm_avg)
+        self.send_command("SPEC:GET?", expect_ok=True)
+        started = time.monotonic()
+        self.wait_for_completion(started)
+        saturation = self.extract_value_after_ok(self.send_command("SPEC:SAT?", expect_ok=True), float)
+        logging.info(f"Probe at gain {gain_level}: saturation {saturation}")
+        return saturation
 
-                time.sleep(1)
 
-            # Check saturation
-            sat = self.send_command("SPEC:SAT?", expect_ok=True)
-            saturation = self.extract_value_after_ok(sat, float)
+    def select_gain(self, apodization, sample_type="", is_igm_avg=False, threshold=SATURATION_THRESHOLD):
+        """
+        Picks the highest GAIN_MAP level whose probe scan stays below `threshold`, starting
+        from the gain last chosen for this device and sample type; see autogain.choose_gain.
+        """
+        key = gain_key(DEVICE_NAME, sample_type, apodization)
+        levels = sorted(GAIN_MAP, key=GAIN_MAP.get)
+        gain_level, probes = choose_gain(
+            levels, lambda level: self.probe_saturation(level, apodization, is_igm_avg=is_igm_avg),
+            threshold, start=self.gain_cache.get(key),
+        )
+        self.gain_cache.put(key, gain_level, probes.get(gain_level))
+        logging.info(f"Auto gain: {gain_level} after {len(probes)} probe(s) {probes}")
+        return gain_level
+
+
+    def acquire_adaptive(self, gain_level, apodization, max_averages, block_averages, is_igm_avg=False,
+                         soc_tolerance=None, noise_tolerance=None):
+        """
+        Acquires blocks of `block_averages` scans until their running mean has converged (see
+        averaging.py) or max_averages scans have been taken. Without a tolerance the spectral
+        noise has to reach DEFAULT_NOISE_TOLERANCE.
 
-            if saturation is not None:
-                if saturation > 0.9:
-                    logging.warning("⚠️ Detector saturation detected.")
+        Returns:
+            (np.ndarray, float, int): The mean spectrum, the highest block saturation (or None)
+            and the number of averages actually taken.
+        """
+        if soc_tolerance is None and noise_tolerance is None:
+            noise_tolerance = DEFAULT_NOISE_TOLERANCE
+        model = load_calibration_model(CALIBRATION_PATH) if soc_tolerance is not None else None
+        averager = SpectrumAverager(model)
+        saturation = None
+
+        while averager.averages < max_averages:
+            # Only SPEC:AVG is re-sent, and only for a shorter last block
+            block = min(block_averages, max_averages - averager.averages)
+            self.configure(gain_level, apodization, block, is_igm_avg)
+            spectrum, block_saturation = self.acquire_spectrum()
+            if not len(spectrum):
+                logging.warning(f"Block {averager.blocks + 1} returned no spectrum; stopping early.")
+                break
+
+            averager.add(spectrum, block)
+            if block_saturation is not None:
+                saturation = block_saturation if saturation is None else max(saturation, block_saturation)
+            noise, soc_error = averager.relative_noise(), averager.soc_error()
+            logging.info(f"Block {averager.blocks}: {averager.averages} averages"
+                         + (f", relative noise {noise:.2e}" if noise is not None else "")
+                         + (f", SOC {averager.soc():.4f} ± {soc_error:.4f}" if soc_error is not None else ""))
+            if averager.converged(soc_tolerance, noise_tolerance, MIN_BLOCKS):
+                logging.info(f"Converged after {averager.averages} of up to {max_averages} averages.")
+                break
+
+        return averager.spectrum(), saturation, averager.averages
+
+
+    def run_acquisition(self, gain_level="Low", apodization="NortonBeerStrong", num_averages=5, is_igm_avg=False, message="",
+                        block_averages=None, soc_tolerance=None, noise_tolerance=None, sample_type=""):
+        """
+        Runs one full measurement cycle on the open connection, leaving it open.
 
-            # Retrieve spectrum
-            raw_response = self.send_command("TRAN:SPEC?", timeout=SPECTRUM_TIMEOUT, expect_ok=True)
-            spectrum = self.parse_spectrum_data(raw_response)
+        With gain_level AUTO_GAIN, the gain is first chosen from probe scans (see select_gain;
+        sample_type selects the cached choice). With block_averages smaller than num_averages,
+        averaging is adaptive: num_averages is the maximum and acquisition stops once the
+        tolerances are met (see acquire_adaptive).
 
-            if spectrum:
-                # Add device_id tag with settings
-                device_id_tag = "simulated-pi_Gain-{0}_Apo-{1}_Avg-{2}_'{3}'".format(
-                    gain_level, apodization, num_averages, message
-                )
-                
-                # Compute and log predicted SOC using calibration model
-                calib_path = os.path.join(os.path.dirname(__file__), "calibration_coeffs.csv")
-                predicted_soc = apply_calibrated_model(spectrum, calib_path)
-                
+        Returns:
+            dict: spectrum_id, predicted_value, saturation, points, gain_level and averages
+            (as actually used) and per-phase timings in seconds, or None if the device was not
+            ready or returned no spectrum. spectrum_id is None if the upload failed or the
+            result was spooled. The phases, commands and sleeps are also recorded in self.timing.
+        """
+        timings = {}
+        with self.timing.phase("total", timings):
+            return self._run_acquisition(timings, gain_level, apodization, num_averages, is_igm_avg, message,
+                                         block_averages, soc_tolerance, noise_tolerance, sample_type)
+
+
+    def _run_acquisition(self, timings, gain_level, apodization, num_averages, is_igm_avg, message,
+                         block_averages, soc_tolerance, noise_tolerance, sample_type):
+        adaptive = block_averages is not None and 0 < block_averages < num_averages
+
+        with self.timing.phase("ready", timings):
+            ready = self.is_ready()
+        if not ready:
+            logging.warning("Device is still initializing. Exiting.")
+            return None
+
+        auto_gain = gain_level == AUTO_GAIN
+        if auto_gain:
+            with self.timing.phase("gain", timings):
+                gain_level = self.select_gain(apodization, sample_type, is_igm_avg)
+
+        with self.timing.phase("configure", timings):
+            self.configure(gain_level, apodization, block_averages if adaptive else num_averages, is_igm_avg)
+
+        with self.timing.phase("acquire", timings):
+            if adaptive:
+                spectrum, saturation, averages = self.acquire_adaptive(
+                    gain_level, apodization, num_averages, block_averages, is_igm_avg, soc_tolerance, noise_tolerance)
+            else:
+                spectrum, saturation = self.acquire_spectrum()
+                averages = num_averages
+
+        if not len(spectrum):
+            logging.warning("No valid spectrum data parsed.")
+            return None
+
+        if auto_gain and saturation is not None and saturation > SATURATION_THRESHOLD:
+            # The probes underestimated it; start a step lower next time
+            levels = sorted(GAIN_MAP, key=GAIN_MAP.get)
+            lower = levels[max(levels.index(gain_level) - 1, 0)]
+            self.gain_cache.put(gain_key(DEVICE_NAME, sample_type, apodization), lower, saturation)
+
+        # Add device_id tag with settings; the API also stores them as separate fields
+        device_id_tag = make_device_id_tag(gain_level, apodization, averages, message)
+        acquisition = make_acquisition_fields(gain_level, apodization, averages, message, saturation)
+
+        # Compute and log predicted SOC using calibration model
+        with self.timing.phase("predict", timings):
+            model = load_calibration_model(CALIBRATION_PATH)
+            predicted_soc = model.predict(spectrum)
+
+        with self.timing.phase("upload", timings):
+            if self.spool is not None:
+                # Uploaded later by a spool.BackgroundUploader
+                spectrum_id = None
+                self.spool.put(spectrum, device_id_tag, predicted_soc, model.version, acquisition)
+            else:
+                # Spectrum and prediction are stored together in one request
                 spectrum_id = self.upload_spectrum(
                     spectrum,
-                    api_url="https://rekehtm1f0.execute-api.us-east-1.amazonaws.com/dev/upload-spectrum/",
-                    device_id=device_id_tag
-                )
-                
-                self.upload_prediction(
-                    predicted_value=predicted_soc,
-                    spectrum_id=spectrum_id,
+                    api_url=SPECTRUM_UPLOAD_URL,
                     device_id=device_id_tag,
-                    api_url="https://rekehtm1f0.execute-api.us-east-1.amazonaws.com/dev/upload-prediction/"
+                    predicted_value=predicted_soc,
+                    model_version=model.version,
+                    acquisition=acquisition
                 )
-                
-            else:
-                logging.warning("No valid spectrum data parsed.")
 
+        # timings["total"] is filled in by run_acquisition when this returns
+        return {
+            "spectrum_id": spectrum_id,
+            "predicted_value": float(predicted_soc),
+            "saturation": saturation,
+            "points": len(spectrum),
+            "gain_level": gain_level,
+            "averages": averages,
+            "timings": timings,
+        }
+
+
+    def run_full_matlab_equivalent(self, gain_level="Low", apodization="NortonBeerStrong", num_averages=5, is_igm_avg=False, message="",
+                                   block_averages=None, soc_tolerance=None, noise_tolerance=None, sample_type=""):
+        try:
+            return self.run_acquisition(gain_level, apodization, num_averages, is_igm_avg, message,
+                                        block_averages, soc_tolerance, noise_tolerance, sample_type)
         finally:
             self.close()
\ No newline at end of file
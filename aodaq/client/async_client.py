@@ -0,0 +1,261 @@
+import asyncio
+import logging
+import numpy as np
+from AoDAQClient import (
+    AUTO_GAIN, CALIBRATION_PATH, DEVICE_NAME, GAIN_MAP, INIT_TIMEOUT, RETRY_ATTEMPTS, SETUP_COMMANDS, SPECTRUM_TIMEOUT,
+    VALIDATE_RESP_OK, make_acquisition_fields, make_device_id_tag, settings_commands,
+)
+from calibration import load_calibration_model
+from polling import CompletionPoller, ScanRateEstimator, scan_key
+from protocol import ResponseFramer, extract_value_after_ok
+from spectrum_parser import SpectrumStreamParser
+import uploads
+
+# --- Configuration ---
+STREAM_LIMIT = 1 << 20  # max line length accepted by the stream reader
+
+
+class AsyncAoDAQClient:
+    """
+    asyncio counterpart of AoDAQClient.
+
+    Replies are read with the same ResponseFramer as the blocking client, so independent
+    commands can be written back-to-back and their replies read in order afterwards
+    (send_pipelined) instead of paying a full round trip per command.
+    """
+
+    def __init__(self, host, port, device_name=DEVICE_NAME, scan_rates=None):
+        self.host = host
+        self.port = port
+        self.device_name = device_name
+        # Time per average by settings, used to schedule MEAS:REM? polls (see polling.py)
+        self.scan_rates = scan_rates if scan_rates is not None else ScanRateEstimator()
+        self._reader = None
+        self._writer = None
+        # Serialises write+read exchanges so replies are matched to the right commands
+        self._lock = asyncio.Lock()
+
+    async def connect(self, timeout=10.0):
+        logging.info(f"Connecting to AoDAQ at {self.host}:{self.port}...")
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, limit=STREAM_LIMIT), timeout
+        )
+        logging.info("✅ Connected.")
+
+    async def close(self):
+        if self._writer:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+            self._writer = None
+            logging.info("Connection closed.")
+
+    async def _read_reply(self, framer, timeout, on_line=None):
+        """Async equivalent of AoDAQClient._read_framed."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not framer.complete:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            wait = min(remaining, framer.idle_timeout) if framer.lines_seen else remaining
+            try:
+                line = await asyncio.wait_for(self._reader.readline(), wait)
+            except asyncio.TimeoutError:
+                if framer.lines_seen:
+                    break
+                continue
+            if not line:
+                break  # connection closed
+            line = line.rstrip(b"\r\n")
+            if on_line:
+                on_line(line)
+            framer.feed_line(line)
+        return framer
+
+    async def _discard_pending(self):
+        while True:
+            try:
+                if not await asyncio.wait_for(self._reader.read(65536), 0.05):
+                    return
+            except asyncio.TimeoutError:
+                return
+
+    async def send_pipelined(self, commands, timeout=INIT_TIMEOUT, expect_ok=True):
+        """
+        Writes all commands at once, then reads one reply per command in order.
+        Commands whose reply is missing or lacks OK are re-sent one at a time. If a reply does
+        not match its command (ResponseFramer.matches_command), the replies are out of step:
+        pending input is discarded and that command and all after it are re-sent one at a time.
+
+        Returns:
+            list[str]: One reply per command.
+        """
+        async with self._lock:
+            for command in commands:
+                logging.info(f"→ {command}")
+            self._writer.write("".join(command + "\n" for command in commands).encode())
+            await self._writer.drain()
+
+            replies = [""] * len(commands)
+            misaligned = len(commands)
+            for i, command in enumerate(commands):
+                framer = await self._read_reply(ResponseFramer(command), timeout)
+                logging.info(f"← {framer.text()}")
+                if not framer.matches_command():
+                    logging.warning(f"Reply does not match {command}; re-sending the rest one at a time")
+                    misaligned = i
+                    break
+                replies[i] = framer.text()
+
+        failed = [i for i, reply in enumerate(replies)
+                  if i >= misaligned or (expect_ok and not any(ok in reply for ok in VALIDATE_RESP_OK))]
+        if failed:
+            async with self._lock:
+                await self._discard_pending()
+            for i in failed:
+                replies[i] = await self.send_command(commands[i], timeout=timeout, expect_ok=expect_ok)
+        return replies
+
+    async def send_command(self, command, timeout=INIT_TIMEOUT, expect_ok=False) -> str:
+        for attempt in range(RETRY_ATTEMPTS):
+            try:
+                async with self._lock:
+                    logging.info(f"→ {command}")
+                    self._writer.write((command + "\n").encode())
+                    await self._writer.drain()
+                    response = (await self._read_reply(ResponseFramer(command), timeout)).text()
+                logging.info(f"← {response}" if len(response) <= 200 else f"← (received {len(response)} chars)")
+
+                if not expect_ok or any(ok in response for ok in VALIDATE_RESP_OK):
+                    return response
+                logging.warning(f"Unexpected response, retrying... [{attempt+1}/{RETRY_ATTEMPTS}]")
+            except (ConnectionError, OSError) as e:
+                logging.warning(f"Attempt {attempt+1} failed: {e}")
+            await asyncio.sleep(1)
+            async with self._lock:
+                await self._discard_pending()
+
+        logging.error(f"Failed to send command after {RETRY_ATTEMPTS} attempts: {command}")
+        return ""
+
+    async def fetch_spectrum(self, timeout=SPECTRUM_TIMEOUT):
+        """
+        Sends TRAN:SPEC? and returns the parsed (N x 2) spectrum array, or an empty one if the
+        reply had fewer points than the device announced.
+        """
+        command = "TRAN:SPEC?"
+        parser = SpectrumStreamParser()
+        async with self._lock:
+            logging.info(f"→ {command}")
+            self._writer.write((command + "\n").encode())
+            await self._writer.drain()
+            framer = await self._read_reply(ResponseFramer(command), timeout, on_line=parser.parse_line)
+            logging.info(f"← ({len(parser)} points)")
+            if framer.expected_points is not None and len(parser) < framer.expected_points:
+                logging.warning(f"Spectrum cut short: {len(parser)} of {framer.expected_points} points")
+                await self._discard_pending()
+                return np.empty((0, 2))
+        return parser.spectrum()
+
+    async def configure(self, gain_level="Low", apodization="NortonBeerStrong", num_averages=5, is_igm_avg=False):
+        """Applies the transfer setup and acquisition settings as one pipelined batch."""
+        await self.send_pipelined(SETUP_COMMANDS + settings_commands(gain_level, apodization, num_averages, is_igm_avg))
+
+    async def wait_for_completion(self, key=None, averages=1, started=None):
+        """
+        Polls MEAS:REM? until it reaches zero without blocking the event loop, sleeping until
+        the predicted end of the measurement in between (see AoDAQClient.wait_for_completion).
+        """
+        started = asyncio.get_running_loop().time() if started is None else started
+        prior = self.scan_rates.seconds_per_average(key) if key else None
+        poller = CompletionPoller(averages, started, prior)
+        while True:
+            rem = await self.send_command("MEAS:REM?", expect_ok=True)
+            remaining = extract_value_after_ok(rem, int)
+            if remaining is None:
+                logging.warning(f"Couldn't parse MEAS:REM? response: {rem}")
+                return
+            logging.info(f"Remaining measurements: {remaining}")
+            if remaining == 0:
+                if key and poller.polls:
+                    self.scan_rates.update(key, poller.seconds_per_average(asyncio.get_running_loop().time()))
+                return
+            await asyncio.sleep(poller.next_delay(remaining, asyncio.get_running_loop().time()))
+
+    async def acquire(self, gain_level="Low", apodization="NortonBeerStrong", num_averages=5, is_igm_avg=False):
+        """
+        Runs one configured acquisition and returns (spectrum, saturation); spectrum is None
+        if the device is not ready. gain_level "Auto" is only supported by AoDAQClient and
+        raises ValueError here.
+        """
+        if gain_level == AUTO_GAIN:
+            raise ValueError(f"gain_level {AUTO_GAIN!r} is not supported by the async client; "
+                             f"pick one of {', '.join(GAIN_MAP)} or use AoDAQClient")
+        _, status = await self.send_pipelined(["*IDN?", "STAT:INIT?"])
+        if "0" not in status:
+            logging.warning("Device is still initializing.")
+            return None, None
+
+        await self.configure(gain_level, apodization, num_averages, is_igm_avg)
+        await self.send_command("SPEC:GET?", expect_ok=True)
+        await self.wait_for_completion(scan_key(gain_level, apodization, num_averages, is_igm_avg), num_averages,
+                                       asyncio.get_running_loop().time())
+
+        saturation = extract_value_after_ok(await self.send_command("SPEC:SAT?", expect_ok=True), float)
+        if saturation is not None and saturation > 0.9:
+            logging.warning("⚠️ Detector saturation detected.")
+
+        return await self.fetch_spectrum(), saturation
+
+    def device_id_tag(self, settings, message=""):
+        """Builds the device_id tag for a settings dict as passed to acquire()."""
+        return make_device_id_tag(
+            settings.get("gain_level", "Low"), settings.get("apodization", "NortonBeerStrong"),
+            settings.get("num_averages", 5), message, device_name=self.device_name
+        )
+
+    def acquisition_fields(self, settings, message="", saturation=None):
+        """Builds the structured settings fields for a settings dict as passed to acquire()."""
+        return make_acquisition_fields(
+            settings.get("gain_level", "Low"), settings.get("apodization", "NortonBeerStrong"),
+            settings.get("num_averages", 5), message, saturation, device_name=self.device_name
+        )
+
+    async def run_acquisitions(self, settings_list):
+        """
+        Runs one acquisition per settings dict (keys as for run_full_matlab_equivalent).
+        Prediction and upload of each spectrum run in a worker thread while the next
+        acquisition is already under way.
+
+        Returns:
+            list: One entry per settings dict, in order: the spectrum id returned by the API,
+            or None where the acquisition or its upload failed.
+        """
+        pending = []
+        for settings in settings_list:
+            settings = dict(settings)
+            message = settings.pop("message", "")
+            spectrum, saturation = await self.acquire(**settings)
+            if spectrum is None or not len(spectrum):
+                logging.warning("No valid spectrum data parsed.")
+                pending.append(None)
+                continue
+
+            device_id_tag = self.device_id_tag(settings, message)
+            acquisition = self.acquisition_fields(settings, message, saturation)
+            pending.append(asyncio.create_task(
+                asyncio.to_thread(predict_and_upload, spectrum.copy(), device_id_tag, acquisition)
+            ))
+
+        await asyncio.gather(*(task for task in pending if task is not None))
+        return [None if task is None else task.result() for task in pending]
+
+
+def predict_and_upload(spectrum, device_id_tag, acquisition=None):
+    """Blocking prediction + upload for one spectrum, meant to run via asyncio.to_thread."""
+    model = load_calibration_model(CALIBRATION_PATH)
+    return uploads.upload_spectrum(spectrum, device_id=device_id_tag, predicted_value=model.predict(spectrum),
+                                   model_version=model.version, acquisition=acquisition)
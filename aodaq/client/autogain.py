@@ -0,0 +1,102 @@
+"""
+Automatic gain selection from short probe scans.
+
+A probe is a measurement of a few averages whose spectrum is never transferred; only
+SPEC:SAT? is read. Saturation rises with gain, so starting from the last gain chosen for the
+same device and sample type (or the highest gain), the search steps down while the probe
+saturates and up while there is enough headroom for the next gain to stay below the
+threshold (saturation roughly doubles per GAIN_MAP step). Each choice is cached
+(optionally in JSON) so the next acquisition usually needs one or two probes.
+"""
+import os
+import json
+import time
+import logging
+import threading
+
+HEADROOM = 0.5  # only probe the next gain up if saturation is below this fraction of the threshold
+
+
+def gain_key(device_name, sample_type, apodization) -> str:
+    return f"{device_name}|{sample_type}|{apodization}"
+
+
+def choose_gain(levels, probe, threshold, start=None, headroom=HEADROOM):
+    """
+    Finds the highest gain whose probe saturation is below `threshold`.
+
+    Args:
+        levels (list[str]): Gain levels, lowest first.
+        probe (callable): Takes a level and returns its saturation, or None if it could not be read.
+        threshold (float): Saturation the chosen gain must stay below.
+        start (str): Level to probe first; the highest if None or unknown.
+        headroom (float): Step up only while saturation < threshold * headroom.
+
+    Returns:
+        (str, dict): The chosen level and the saturation measured for each probed level. If
+        even the lowest level saturates it is returned anyway; if a probe fails the search
+        stops at the last level known to be below the threshold (or the lowest level).
+    """
+    index = levels.index(start) if start in levels else len(levels) - 1
+    probes = {}
+
+    def measure(i):
+        probes[levels[i]] = probe(levels[i])
+        return probes[levels[i]]
+
+    saturation = measure(index)
+    if saturation is None:
+        return levels[0], probes
+
+    if saturation >= threshold:
+        while index > 0:
+            index -= 1
+            saturation = measure(index)
+            if saturation is None or saturation < threshold:
+                break
+        if saturation is None:
+            return levels[0], probes
+        if saturation >= threshold:
+            logging.warning(f"Saturated ({saturation:.3f}) even at gain {levels[index]}.")
+        return levels[index], probes
+
+    while index + 1 < len(levels) and saturation < threshold * headroom:
+        next_saturation = measure(index + 1)
+        if next_saturation is None or next_saturation >= threshold:
+            break
+        index += 1
+        saturation = next_saturation
+    return levels[index], probes
+
+
+class GainCache:
+    """Last gain chosen per gain_key, with the probe saturation it was chosen on."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable gain cache {path}: {e}")
+
+    def get(self, key):
+        """The cached gain level for `key`, or None."""
+        with self._lock:
+            entry = self.entries.get(key)
+        return entry["gain"] if entry else None
+
+    def put(self, key, gain_level, saturation=None):
+        with self._lock:
+            self.entries[key] = {"gain": gain_level, "saturation": saturation, "updated": time.time()}
+            entries = dict(self.entries)
+        if not self.path:
+            return
+        try:
+            with open(self.path, "w") as f:
+                json.dump(entries, f, indent=2)
+        except OSError as e:
+            logging.warning(f"Could not save gain cache to {self.path}: {e}")
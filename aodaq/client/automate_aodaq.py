@@ -1,10 +1,16 @@
 import os
 import time
-import socket
+import shlex
 import logging
 import argparse                                                                                        
+import threading
 import subprocess
 from AoDAQClient import AoDAQClient
+from daemon import AcquisitionDaemon
+from autogain import GainCache
+from polling import ScanRateEstimator
+from spool import BackgroundUploader, UploadSpool
+from timing import TimingRecorder
 
 
 # --- Configuration ---
@@ -14,6 +20,13 @@ AODAQ_HOST = "127.0.0.1"
 AODAQ_PORT = 1242
 CHECK_INTERVAL = 2.0  # seconds
 MAX_STARTUP_TIME = 60  # seconds
+SPOOL_FLUSH_TIMEOUT = 60  # seconds to keep uploading spooled results before exiting
+SCAN_RATE_PATH = os.path.join(SCRIPT_DIR, "scan_rates.json")  # measured time per average, by settings
+GAIN_CACHE_PATH = os.path.join(SCRIPT_DIR, "gain_cache.json")  # --gain Auto choices, by device / sample type
+# Arguments that make the AoDAQ server listen on another port, with "{port}" substituted,
+# e.g. AODAQ_PORT_ARGS="--port {port}". AoDAQ-v1.4.2 has no known port option, so servers
+# are only spawned on AODAQ_PORT unless this is configured.
+AODAQ_PORT_ARGS = shlex.split(os.environ.get("AODAQ_PORT_ARGS", ""))
 
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
@@ -26,24 +39,11 @@ def wait_for_aodaq(host, port, timeout=MAX_STARTUP_TIME):
         try:
             logging.info("Checking if AoDAQ is ready...")
 
-            with socket.create_connection((host, port), timeout=5) as sock:
-                def send_cmd(cmd):
-                    sock.sendall((cmd + "\n").encode())
-                    time.sleep(0.5)
-                    sock.settimeout(5)
-                    response_parts = []
-                    while True:
-                        try:
-                            chunk = sock.recv(4096)
-                            if not chunk:
-                                break
-                            response_parts.append(chunk)
-                        except socket.timeout:
-                            break
-                    return b''.join(response_parts).decode('utf-8', errors='replace').strip()
-
+            client = AoDAQClient(host, port)
+            client.connect(timeout=5)
+            try:
                 # Step 1: Check *IDN?
-                idn_response = send_cmd("*IDN?")
+                idn_response = client.send_command("*IDN?")
                 if "ARCspectro" not in idn_response:
                     logging.info("AoDAQ not fully ready yet (no IDN response), retrying...")
                     time.sleep(CHECK_INTERVAL)
@@ -52,12 +52,14 @@ def wait_for_aodaq(host, port, timeout=MAX_STARTUP_TIME):
                 logging.info("AoDAQ responded to *IDN?")
 
                 # Step 2: Check STAT:INIT?
-                status_response = send_cmd("STAT:INIT?")
+                status_response = client.send_command("STAT:INIT?")
                 if "0" in status_response:
                     logging.info("AoDAQ initialization complete.")
                     return True
                 else:
                     logging.info("AoDAQ still initializing... waiting.")
+            finally:
+                client.close()
         except Exception as e:
             logging.info(f"AoDAQ not reachable yet ({e}), retrying...")
 
@@ -67,18 +69,23 @@ def wait_for_aodaq(host, port, timeout=MAX_STARTUP_TIME):
     return False
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Automate AoDAQ Acquisition")
-    parser.add_argument("--msg", type=str, default="", help="Message to add to name of device")
-    parser.add_argument("--gain", type=str, default="High", help="Gain level (e.g., High, Low)")
-    parser.add_argument("--apo", type=str, default="NortonBeerStrong", help="Apodization type")
-    parser.add_argument("--avg", type=int, default=100, help="Number of averages")
-
-    args = parser.parse_args()
-    
-    logging.info(f"Starting AoDAQ server: {AODAQ_EXECUTABLE}")
-    aodaq_process = subprocess.Popen(
-        [AODAQ_EXECUTABLE, "-v"],
+def start_aodaq(executable=AODAQ_EXECUTABLE, port=AODAQ_PORT, label="AoDAQ", port_args=None):
+    """
+    Starts an AoDAQ server and streams its output into the log with the given label.
+    A port other than AODAQ_PORT needs port_args (default AODAQ_PORT_ARGS); without them
+    ValueError is raised rather than starting a server that listens somewhere else.
+    """
+    port_args = AODAQ_PORT_ARGS if port_args is None else port_args
+    command = [executable, "-v"]
+    if port != AODAQ_PORT:
+        if not port_args:
+            raise ValueError(f"Cannot start AoDAQ on port {port}: no port arguments configured "
+                             f"(set AODAQ_PORT_ARGS, e.g. \"--port {{port}}\")")
+        command += [arg.format(port=port) for arg in port_args]
+
+    logging.info(f"Starting AoDAQ server: {' '.join(command)}")
+    process = subprocess.Popen(
+        command,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
         text=True,
@@ -86,31 +93,105 @@ def main():
     )
 
     # Stream AoDAQ output live
-    def stream_process_output(process):
+    def stream_process_output():
         for line in process.stdout:
-            logging.info(f"[AoDAQ] {line.strip()}")
+            logging.info(f"[{label}] {line.strip()}")
+
+    threading.Thread(target=stream_process_output, daemon=True).start()
+    return process
 
-    import threading
-    threading.Thread(target=stream_process_output, args=(aodaq_process,), daemon=True).start()
+
+def stop_aodaq(process):
+    """Terminates an AoDAQ server, killing it if it does not exit within 10 s."""
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        logging.warning("AoDAQ did not terminate cleanly, killing...")
+        process.kill()
+
+
+def log_timing_summary(timing):
+    summary = timing.summary()
+    for kind in ("phase", "sleep", "command"):
+        for name, stats in sorted(summary[kind].items(), key=lambda item: -item[1]["total_s"]):
+            extra = f", {stats['retries']} retries, {stats['failures']} failed" if kind == "command" else ""
+            logging.info(f"Timing {kind} {name}: {stats['count']}x, total {stats['total_s']:.2f}s, "
+                         f"p50 {stats['p50_s'] * 1e3:.1f}ms, p95 {stats['p95_s'] * 1e3:.1f}ms{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Automate AoDAQ Acquisition")
+    parser.add_argument("--msg", type=str, default="", help="Message to add to name of device")
+    parser.add_argument("--gain", type=str, default="High", help="Gain level (e.g., High, Low, or Auto)")
+    parser.add_argument("--sample-type", type=str, default="", help="Sample type the --gain Auto choice is cached for")
+    parser.add_argument("--apo", type=str, default="NortonBeerStrong", help="Apodization type")
+    parser.add_argument("--avg", type=int, default=100, help="Number of averages (the maximum with --block-avg)")
+    parser.add_argument("--block-avg", type=int, default=None,
+                        help="Average adaptively in blocks of this many, stopping once converged")
+    parser.add_argument("--soc-tol", type=float, default=None, help="Adaptive: stop at this SOC standard error")
+    parser.add_argument("--noise-tol", type=float, default=None,
+                        help="Adaptive: stop at this relative spectral noise (default 0.002 if no --soc-tol)")
+    parser.add_argument("--interval", type=float, default=None, help="Keep running, acquiring every N seconds")
+    parser.add_argument("--on-demand", action="store_true", help="Keep running, acquiring on SIGUSR1")
+    parser.add_argument("--cycles", type=int, default=None, help="Stop the daemon after this many acquisitions")
+    parser.add_argument("--settings-file", type=str, default=None, help="JSON settings re-read before each cycle")
+    parser.add_argument("--spool", type=str, default=None, help="SQLite spool; upload in the background from it")
+    parser.add_argument("--timing-log", type=str, default=None, help="Append command/phase timings to this JSONL file")
+
+    args = parser.parse_args()
+    
+    uploader = None
+    spool = None
+    timing = TimingRecorder(args.timing_log)
+    if args.spool:
+        spool = UploadSpool(args.spool)
+        uploader = BackgroundUploader(spool).start()
+
+    aodaq_process = start_aodaq()
 
     try:
         # Wait until AoDAQ is ready
         if not wait_for_aodaq(AODAQ_HOST, AODAQ_PORT):
             logging.error("AoDAQ did not become ready in time. Exiting.")
-            aodaq_process.terminate()
             return
         
+        settings = {
+            "gain_level": args.gain,
+            "apodization": args.apo,
+            "num_averages": args.avg,
+            "is_igm_avg": False,
+            "message": args.msg,
+            "block_averages": args.block_avg,
+            "soc_tolerance": args.soc_tol,
+            "noise_tolerance": args.noise_tol,
+            "sample_type": args.sample_type,
+        }
+        client = AoDAQClient(AODAQ_HOST, AODAQ_PORT, spool=spool, timing=timing,
+                             scan_rates=ScanRateEstimator(SCAN_RATE_PATH), gain_cache=GainCache(GAIN_CACHE_PATH))
+
+        if args.interval is not None or args.on_demand:
+            # Daemon mode: the server and connection stay up between acquisitions
+            def ensure_server():
+                nonlocal aodaq_process
+                if aodaq_process.poll() is None:
+                    return True
+                logging.warning(f"AoDAQ exited with {aodaq_process.returncode}, restarting...")
+                client.close()
+                aodaq_process = start_aodaq()
+                return wait_for_aodaq(AODAQ_HOST, AODAQ_PORT)
+
+            daemon = AcquisitionDaemon(client, settings, interval=args.interval,
+                                       settings_file=args.settings_file, ensure_server=ensure_server)
+            daemon.install_signal_handlers()
+            logging.info(f"Daemon running (pid {os.getpid()}); send SIGUSR1 to trigger an acquisition.")
+            daemon.run(max_cycles=args.cycles)
+            return
+
         # Run the AoDAQ Client
         logging.info("Starting AoDAQ Client acquisition...")
-        client = AoDAQClient(AODAQ_HOST, AODAQ_PORT)
         client.connect()
-        client.run_full_matlab_equivalent(
-            gain_level=args.gain,
-            apodization=args.apo,
-            num_averages=args.avg,
-            is_igm_avg=False,
-            message=args.msg
-        )
+        client.run_full_matlab_equivalent(**settings)
 
     except Exception as e:
         logging.error(f"Unexpected error during automation: {e}")
@@ -118,12 +199,14 @@ def main():
     finally:
         # Shutdown AoDAQ properly
         logging.info("Shutting down AoDAQ...")
-        aodaq_process.terminate()
-        try:
-            aodaq_process.wait(timeout=10)
-        except subprocess.TimeoutExpired:
-            logging.warning("AoDAQ did not terminate cleanly, killing...")
-            aodaq_process.kill()
+        stop_aodaq(aodaq_process)
+        if uploader is not None:
+            if not uploader.flush(timeout=SPOOL_FLUSH_TIMEOUT):
+                logging.warning(f"{spool.pending_count()} results left in spool {args.spool}; they will upload next run.")
+            uploader.stop()
+            spool.close()
+        log_timing_summary(timing)
+        timing.close()
         logging.info("Automation completed.")
 
 if __name__ == "__main__":
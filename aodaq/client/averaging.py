@@ -0,0 +1,102 @@
+"""
+Adaptive averaging: acquire in blocks of a few averages and stop once the running mean has
+converged, instead of always asking the device for a fixed SPEC:AVG.
+
+Each block is one measurement of block_averages scans. SpectrumAverager keeps a running,
+scan-weighted mean and variance of the block spectra (Welford, so memory does not grow with
+the number of blocks) and, if given a calibration model, of the block SOC predictions. The
+spread between blocks gives the standard error of the running mean, which is what the stop
+criteria compare against:
+
+    soc_tolerance     standard error of the mean predicted SOC
+    noise_tolerance   RMS standard error of the mean spectrum, relative to its RMS intensity
+"""
+import numpy as np
+
+MIN_BLOCKS = 3  # blocks needed before the between-block spread is trusted
+DEFAULT_NOISE_TOLERANCE = 0.002
+
+
+class SpectrumAverager:
+    """
+    Running mean / variance of block spectra, weighted by the scans in each block. The first
+    block fixes the wavelength grid; later blocks on a different grid are interpolated onto it.
+    """
+
+    def __init__(self, model=None):
+        self.model = model
+        self.blocks = 0
+        self.averages = 0
+        self.wavelengths = None
+        self._mean = None
+        self._m2 = None
+        self._soc_mean = 0.0
+        self._soc_m2 = 0.0
+
+    def add(self, spectrum, averages):
+        """Adds one block: an (N x 2) spectrum that is the mean of `averages` scans."""
+        spectrum = np.asarray(spectrum, dtype=float)
+        wavelengths, intensities = spectrum[:, 0], spectrum[:, 1]
+        if self.wavelengths is None:
+            self.wavelengths = wavelengths.copy()
+            self._mean = np.zeros(len(wavelengths))
+            self._m2 = np.zeros(len(wavelengths))
+        elif len(wavelengths) != len(self.wavelengths) or not np.array_equal(wavelengths, self.wavelengths):
+            order = np.argsort(wavelengths, kind="stable")
+            intensities = np.interp(self.wavelengths, wavelengths[order], intensities[order])
+
+        # Weighted Welford update (West, 1979)
+        self.blocks += 1
+        self.averages += averages
+        weight = averages / self.averages
+        delta = intensities - self._mean
+        self._mean += weight * delta
+        self._m2 += averages * delta * (intensities - self._mean)
+
+        if self.model is not None:
+            soc = float(self.model.predict(np.column_stack((self.wavelengths, intensities))))
+            soc_delta = soc - self._soc_mean
+            self._soc_mean += weight * soc_delta
+            self._soc_m2 += averages * soc_delta * (soc - self._soc_mean)
+
+    def spectrum(self):
+        """The running mean as an (N x 2) spectrum."""
+        if self.wavelengths is None:
+            return np.empty((0, 2))
+        return np.column_stack((self.wavelengths, self._mean))
+
+    def _standard_error(self, m2):
+        # With scan-weighted blocks, m2 / (blocks - 1) estimates the variance of a single scan
+        if self.blocks < 2:
+            return None
+        per_scan_variance = m2 / (self.blocks - 1)
+        return np.sqrt(per_scan_variance / self.averages)
+
+    def soc(self):
+        """Mean of the block predictions, or None without a model."""
+        return self._soc_mean if self.model is not None and self.blocks else None
+
+    def soc_error(self):
+        """Standard error of soc(), or None until there are two blocks."""
+        if self.model is None:
+            return None
+        error = self._standard_error(self._soc_m2)
+        return None if error is None else float(error)
+
+    def relative_noise(self):
+        """RMS standard error of the mean spectrum over its RMS intensity, or None until there are two blocks."""
+        error = self._standard_error(self._m2)
+        if error is None:
+            return None
+        signal = np.sqrt(np.mean(self._mean ** 2))
+        return float(np.sqrt(np.mean(error ** 2)) / signal) if signal > 0 else float("inf")
+
+    def converged(self, soc_tolerance=None, noise_tolerance=None, min_blocks=MIN_BLOCKS) -> bool:
+        """True once every given tolerance is met, after at least min_blocks blocks."""
+        if self.blocks < max(min_blocks, 2):
+            return False
+        if soc_tolerance is not None and (self.soc_error() is None or self.soc_error() > soc_tolerance):
+            return False
+        if noise_tolerance is not None and self.relative_noise() > noise_tolerance:
+            return False
+        return soc_tolerance is not None or noise_tolerance is not None
@@ -0,0 +1,71 @@
+"""
+Compares the original per-spectrum SOC prediction (scipy interp1d, SNV and a dot product for
+every spectrum) against the vectorized batch path.
+
+    python bench_calibration.py --spectra 2000 --points 1500
+"""
+import time
+import argparse
+import numpy as np
+from scipy.interpolate import interp1d
+from calibration import CalibrationModel, snv
+
+
+def make_synthetic_model(num_coeffs, rng):
+    wavelengths = np.linspace(1300.0, 2500.0, num_coeffs)
+    return CalibrationModel(wavelengths, rng.normal(size=num_coeffs), constant=3.2)
+
+
+def make_synthetic_spectra(num_spectra, num_points, rng):
+    wavelengths = np.linspace(900.0, 2600.0, num_points)
+    baseline = np.sin(wavelengths / 150.0)
+    intensities = baseline + 0.05 * rng.normal(size=(num_spectra, num_points))
+    return wavelengths, intensities
+
+
+def baseline_predict(model, raw_spectrum):
+    """The per-spectrum path calibration.py used before batching, kept here as the reference."""
+    raw = np.asarray(raw_spectrum, dtype=float)
+    interpolator = interp1d(raw[:, 0], raw[:, 1], bounds_error=False, fill_value="extrapolate")
+    aligned = snv(interpolator(model.wavelengths))
+    return (np.dot(aligned, model.coefficients) + model.constant) * model.scale
+
+
+def time_call(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched calibration against the per-spectrum loop")
+    parser.add_argument("--spectra", type=int, default=2000, help="Number of spectra")
+    parser.add_argument("--points", type=int, default=1500, help="Points per spectrum")
+    parser.add_argument("--coeffs", type=int, default=200, help="Calibration grid size")
+    parser.add_argument("--repeats", type=int, default=3, help="Best-of repeats")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    model = make_synthetic_model(args.coeffs, rng)
+    wavelengths, intensities = make_synthetic_spectra(args.spectra, args.points, rng)
+    spectra = [np.column_stack((wavelengths, row)) for row in intensities]
+
+    loop_time, loop_result = time_call(lambda: np.array([baseline_predict(model, s) for s in spectra]), args.repeats)
+    cached_time, cached_result = time_call(lambda: np.array([model.predict(s) for s in spectra]), args.repeats)
+    batch_time, batch_result = time_call(lambda: model.predict_batch(spectra), args.repeats)
+    matrix_time, matrix_result = time_call(lambda: model.predict_matrix(wavelengths, intensities), args.repeats)
+
+    print(f"{args.spectra} spectra x {args.points} points -> {args.coeffs} coefficients")
+    print(f"  interp1d loop     : {loop_time * 1e3:9.1f} ms  (original per-spectrum path)")
+    for label, elapsed in (("predict loop", cached_time), ("predict_batch", batch_time),
+                           ("predict_matrix", matrix_time)):
+        print(f"  {label:<17} : {elapsed * 1e3:9.1f} ms  ({loop_time / elapsed:5.1f}x)")
+    difference = max(np.abs(loop_result - result).max() for result in (cached_result, batch_result, matrix_result))
+    print(f"  max |difference|  : {difference:.3g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Benchmarks AoDAQClient against the local simulator: per-command overhead in each framing
+mode, wait_for_aodaq start-up detection and end-to-end acquisition cycles. Results are
+spooled to a temporary file and predicted with a synthetic calibration, so no API or
+spectrometer is needed.
+
+    python bench_client.py --cycles 5 --points 2000 --latency 0.002 --scan-time 0.05
+    python bench_client.py --cycles 20 --drop 0.01 --error 0.01 --truncate 0.05
+    python bench_client.py --averages 100 --block-averages 10 --noise-tol 0.002
+"""
+import os
+import time
+import logging
+import argparse
+import tempfile
+import numpy as np
+import AoDAQClient as client_module
+from AoDAQClient import AoDAQClient
+from automate_aodaq import wait_for_aodaq
+from protocol import FRAMING_FRAMED, FRAMING_LEGACY
+from simulator import AoDAQSimulator, SIM_HOST
+from spool import UploadSpool
+
+PHASES = ["ready", "configure", "acquire", "predict", "upload", "total"]
+
+
+def write_synthetic_calibration(path, num_coeffs=200, seed=0):
+    rng = np.random.default_rng(seed)
+    wavelengths = np.linspace(1300.0, 2500.0, num_coeffs)
+    with open(path, "w") as f:
+        for i, (wl, coeff) in enumerate(zip(wavelengths, rng.normal(size=num_coeffs))):
+            f.write(f"{float(wl)!r},{float(coeff)!r},{'3.2' if i == 0 else ''}\n")
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1e3 if samples else float("nan")
+
+
+def time_commands(client, command, repeats, **kwargs):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        if command == "TRAN:SPEC?":
+            client.fetch_spectrum(**kwargs)
+        else:
+            client.send_command(command, expect_ok=True, **kwargs)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_commands(server, framing, repeats, latency):
+    """Per-command round trips, with the simulator's configured latency subtracted."""
+    client = AoDAQClient(SIM_HOST, server.port, framing=framing)
+    client.connect()
+    rows = []
+    try:
+        for command in ["*IDN?", "GAIN:SET 0", "MEAS:REM?", "SPEC:SAT?", "TRAN:SPEC?"]:
+            samples = [s - latency for s in time_commands(client, command, repeats)]
+            rows.append((command, samples))
+    finally:
+        client.close()
+    return rows
+
+
+def bench_startup(init_time, latency):
+    """Time for wait_for_aodaq to notice a simulator that reports initialising for init_time seconds."""
+    server = AoDAQSimulator(latency=latency, init_time=init_time).start()
+    try:
+        start = time.perf_counter()
+        ready = wait_for_aodaq(SIM_HOST, server.port, timeout=init_time + 30)
+        return ready, time.perf_counter() - start
+    finally:
+        server.stop()
+
+
+def bench_cycles(server, cycles, spool, settings, reconnect):
+    """
+    Runs acquisition cycles with the given run_acquisition settings; reconnect=True goes
+    through run_full_matlab_equivalent each time.
+    """
+    client = AoDAQClient(SIM_HOST, server.port, spool=spool)
+    results = []
+    failures = 0
+    if not reconnect:
+        client.connect()
+    try:
+        for _ in range(cycles):
+            start = time.perf_counter()
+            if reconnect:
+                client.connect()
+                result = client.run_full_matlab_equivalent(**settings)
+            else:
+                result = client.run_acquisition(**settings)
+            if result is None:
+                failures += 1
+            else:
+                result["timings"]["wall"] = time.perf_counter() - start
+                results.append(result)
+    finally:
+        client.close()
+    return results, failures, client.timing
+
+
+def print_command_table(label, rows):
+    print(f"  {label}")
+    print(f"    {'command':<12} {'mean':>9} {'p50':>9} {'p95':>9}  (ms, excluding simulated latency)")
+    for command, samples in rows:
+        print(f"    {command:<12} {np.mean(samples) * 1e3:9.2f} {percentile_ms(samples, 50):9.2f} "
+              f"{percentile_ms(samples, 95):9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the AoDAQ client against a simulated server")
+    parser.add_argument("--cycles", type=int, default=5, help="Acquisition cycles per mode")
+    parser.add_argument("--repeats", type=int, default=20, help="Round trips per command")
+    parser.add_argument("--points", type=int, default=2000, help="Points per spectrum")
+    parser.add_argument("--averages", type=int, default=5, help="SPEC:AVG per acquisition")
+    parser.add_argument("--block-averages", type=int, default=None,
+                        help="Also run adaptive cycles in blocks of this many averages (up to --averages)")
+    parser.add_argument("--soc-tol", type=float, default=None, help="Adaptive SOC standard error tolerance")
+    parser.add_argument("--noise-tol", type=float, default=None, help="Adaptive relative noise tolerance")
+    parser.add_argument("--scan-time", type=float, default=0.05, help="Simulated seconds per averaged scan")
+    parser.add_argument("--latency", type=float, default=0.002, help="Simulated seconds before each reply")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency, up to this many seconds")
+    parser.add_argument("--init-time", type=float, default=1.0, help="Simulated initialisation for wait_for_aodaq")
+    parser.add_argument("--drop", type=float, default=0.0, help="Probability a reply is dropped")
+    parser.add_argument("--error", type=float, default=0.0, help="Probability a reply is an ERR line")
+    parser.add_argument("--truncate", type=float, default=0.0, help="Probability a spectrum reply is cut short")
+    parser.add_argument("--disconnect", type=float, default=0.0, help="Probability the connection is closed")
+    parser.add_argument("--legacy", action="store_true",
+                        help="Also time legacy framing (each command waits out the socket timeout, so it is slow)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="Keep the client's per-command logging")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    faults = {"drop": args.drop, "error": args.error, "truncate": args.truncate, "disconnect": args.disconnect}
+    faults = {fault: p for fault, p in faults.items() if p > 0}
+    server = AoDAQSimulator(latency=args.latency, jitter=args.jitter, faults=faults, seed=args.seed,
+                            points=args.points, scan_time=args.scan_time).start()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        client_module.CALIBRATION_PATH = os.path.join(workdir, "calibration_coeffs.csv")
+        write_synthetic_calibration(client_module.CALIBRATION_PATH)
+        spool = UploadSpool(os.path.join(workdir, "spool.db"))
+
+        try:
+            print(f"Simulator: {args.points} points, {args.averages} averages x {args.scan_time * 1e3:.0f} ms, "
+                  f"latency {args.latency * 1e3:.1f} ms (+{args.jitter * 1e3:.1f} ms jitter), faults {faults or 'none'}")
+
+            print("Per-command overhead")
+            # Faults would only add retry sleeps to the command timings, so measure them on a clean server
+            clean = server if not faults else AoDAQSimulator(latency=args.latency, jitter=args.jitter, seed=args.seed,
+                                                             points=args.points, scan_time=args.scan_time).start()
+            try:
+                print_command_table("framed", bench_commands(clean, FRAMING_FRAMED, args.repeats, args.latency))
+                if args.legacy:
+                    print_command_table("legacy", bench_commands(clean, FRAMING_LEGACY, min(args.repeats, 2),
+                                                                 args.latency))
+            finally:
+                if clean is not server:
+                    clean.stop()
+
+            ready, startup = bench_startup(args.init_time, args.latency)
+            print(f"wait_for_aodaq: {'ready' if ready else 'NOT ready'} after {startup:.2f} s "
+                  f"(simulated initialisation {args.init_time:.2f} s)")
+
+            commands_before = server.stats["commands"]
+            settings = {"num_averages": args.averages}
+            modes = [("run_acquisition (kept connection)", settings, False),
+                     ("run_full_matlab_equivalent (connect per cycle)", settings, True)]
+            if args.block_averages:
+                modes.append((f"adaptive averaging (blocks of {args.block_averages})",
+                              dict(settings, block_averages=args.block_averages, soc_tolerance=args.soc_tol,
+                                   noise_tolerance=args.noise_tol), False))
+            for label, mode_settings, reconnect in modes:
+                start = time.perf_counter()
+                results, failures, timing = bench_cycles(server, args.cycles, spool, mode_settings, reconnect)
+                elapsed = time.perf_counter() - start
+                short = sum(1 for r in results if r["points"] < args.points)
+                averages = np.mean([r["averages"] for r in results]) if results else 0
+                print(f"{label}: {len(results)}/{args.cycles} cycles ok ({short} with truncated spectra), "
+                      f"{failures} failed, {len(results) / elapsed if elapsed else 0:.2f} spectra/s, "
+                      f"{averages:.1f} averages per spectrum")
+                for phase in PHASES + ["wall"]:
+                    samples = [r["timings"][phase] for r in results if phase in r["timings"]]
+                    if samples:
+                        print(f"    {phase:<10} mean {np.mean(samples) * 1e3:9.1f} ms   "
+                              f"p95 {percentile_ms(samples, 95):9.1f} ms")
+                summary = timing.summary()
+                sleeps = ", ".join(f"{name} {stats['total_s']:.2f}s" for name, stats in summary["sleep"].items())
+                waiting = sum(stats["total_s"] for stats in summary["command"].values())
+                retries = sum(stats["retries"] for stats in summary["command"].values())
+                print(f"    client sleeps: {sleeps or 'none'}; {waiting:.2f}s in commands, {retries} retries")
+            print(f"Simulator handled {server.stats['commands'] - commands_before} commands during the cycles, "
+                  f"{server.stats['faults']} injected faults")
+        finally:
+            spool.close()
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
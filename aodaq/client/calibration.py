@@ -1,26 +1,35 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
 import numpy as np
 import pandas as pd
-from scipy.interpolate import interp1d
+from scipy import sparse
+
+OUTPUT_SCALE = 0.1  # Assuming we are expecting ~4.18 instead of ~41.8
+INTERP_CACHE_SIZE = 32  # Distinct source wavelength grids remembered per model
+
+# path -> (mtime_ns, CalibrationModel)
+_MODEL_CACHE = {}
 
 
 def load_calibration_csv(path):
-    df = pd.read_csv(path, header=None, names=["wavelength", "coefficient", "constant"])
+    # round_trip parsing gives the exact same doubles as float(), so model versions match the backend
+    df = pd.read_csv(path, header=None, names=["wavelength", "coefficient", "constant"], float_precision="round_trip")
+
+    # Grab the first available constant
+    calib_const = df["constant"].dropna().iloc[0]
 
     # Keep rows where coefficient is not NaN
     df = df[pd.notnull(df["coefficient"])]
     calib_wavelengths = df["wavelength"].to_numpy(dtype=float)
     calib_coeffs = df["coefficient"].to_numpy(dtype=float)
 
-    # Grab the first available constant
-    constant_row = pd.read_csv(path, header=None, names=["wavelength", "coefficient", "constant"])
-    calib_const = constant_row["constant"].dropna().iloc[0]
-
     return calib_wavelengths, calib_coeffs, calib_const
 
 
 def interpolate_spectrum(raw_wavelengths, raw_intensities, target_wavelengths):
-    interpolator = interp1d(raw_wavelengths, raw_intensities, bounds_error=False, fill_value="extrapolate")
-    return interpolator(target_wavelengths)
+    return apply_interp_weights(raw_intensities, linear_interp_weights(raw_wavelengths, target_wavelengths))
 
 
 def snv(x):
@@ -33,15 +42,192 @@ def snv(x):
     return (x - mu) / sigma
 
 
+def snv_rows(x):
+    """
+    Row-wise SNV for an (N spectra x M points) matrix; rows with zero spread become zeros, as in snv.
+    """
+    x = np.nan_to_num(np.asarray(x, dtype=float), nan=0.0, posinf=0.0, neginf=0.0)
+    mu = x.mean(axis=1, keepdims=True)
+    sigma = x.std(axis=1, keepdims=True)
+    flat = (sigma == 0)
+    out = (x - mu) / np.where(flat, 1.0, sigma)
+    out[np.broadcast_to(flat, out.shape)] = 0.0
+    return out
+
+
+def linear_interp_weights(source_wavelengths, target_wavelengths):
+    """
+    Precomputes linear interpolation from a source grid to a target grid, extrapolating
+    linearly beyond the ends like interp1d(fill_value="extrapolate").
+
+    Returns:
+        (order, lo, frac): sort order of the source grid, index of the left neighbour in the
+        sorted grid for each target point, and the fractional distance towards the right one.
+    """
+    source = np.asarray(source_wavelengths, dtype=float)
+    target = np.asarray(target_wavelengths, dtype=float)
+    order = np.argsort(source, kind="stable")
+    xs = source[order]
+
+    # Clamp to the first/last segment so out-of-range targets extrapolate along it
+    lo = np.clip(np.searchsorted(xs, target, side="right") - 1, 0, len(xs) - 2)
+    frac = (target - xs[lo]) / (xs[lo + 1] - xs[lo])
+    return order, lo, frac
+
+
+def apply_interp_weights(intensities, weights):
+    """
+    Applies linear_interp_weights output to a 1-D spectrum or to each row of an (N x M) matrix.
+    """
+    order, lo, frac = weights
+    y = np.asarray(intensities, dtype=float)[..., order]
+    return y[..., lo] * (1.0 - frac) + y[..., lo + 1] * frac
+
+
+def interpolation_matrix(source_wavelengths, target_wavelengths):
+    """
+    Builds the sparse (len(target) x len(source)) matrix that linearly interpolates a spectrum
+    on the source grid onto the target grid. Each row has at most two non-zeros.
+    """
+    order, lo, frac = linear_interp_weights(source_wavelengths, target_wavelengths)
+    rows = np.arange(len(lo))
+    return sparse.csr_matrix(
+        (np.concatenate((1.0 - frac, frac)),
+         (np.concatenate((rows, rows)), np.concatenate((order[lo], order[lo + 1])))),
+        shape=(len(lo), len(order)),
+    )
+
+
+def grid_key(wavelengths):
+    wavelengths = np.ascontiguousarray(wavelengths, dtype=float)
+    return len(wavelengths), hashlib.blake2b(wavelengths.tobytes(), digest_size=16).digest()
+
+
+class CalibrationModel:
+    """
+    A loaded linear calibration: interpolate onto the calibration grid, SNV, dot with coefficients.
+    """
+
+    def __init__(self, wavelengths, coefficients, constant, scale=OUTPUT_SCALE):
+        self.wavelengths = np.ascontiguousarray(wavelengths, dtype=float)
+        self.coefficients = np.ascontiguousarray(coefficients, dtype=float)
+        self.constant = float(constant)
+        self.scale = scale
+        # grid_key(source wavelengths) -> interpolation matrix onto self.wavelengths, LRU order
+        self._interp_cache = OrderedDict()
+        self._interp_lock = threading.Lock()
+
+    @property
+    def version(self):
+        """Short content hash identifying this calibration, sent with each prediction."""
+        digest = hashlib.blake2b(digest_size=8)
+        for part in (self.wavelengths, self.coefficients, np.array([self.constant, self.scale])):
+            digest.update(np.ascontiguousarray(part, dtype="<f8").tobytes())
+        return digest.hexdigest()
+
+    @classmethod
+    def from_csv(cls, path, scale=OUTPUT_SCALE):
+        return cls(*load_calibration_csv(path), scale=scale)
+
+    def interpolation_matrix_for(self, wavelengths):
+        """
+        Returns the cached interpolation matrix from the given source grid onto the calibration
+        grid, building it on first use. Spectra taken with the same settings share a grid, so
+        this is normally built once per device configuration.
+        """
+        key = grid_key(wavelengths)
+        with self._interp_lock:
+            matrix = self._interp_cache.get(key)
+            if matrix is not None:
+                self._interp_cache.move_to_end(key)
+                return matrix
+
+        matrix = interpolation_matrix(wavelengths, self.wavelengths)
+        with self._interp_lock:
+            self._interp_cache[key] = matrix
+            while len(self._interp_cache) > INTERP_CACHE_SIZE:
+                self._interp_cache.popitem(last=False)
+        return matrix
+
+    def align(self, wavelengths, intensities):
+        """
+        Interpolates a 1-D spectrum, or each row of an (N x M) matrix, onto the calibration grid.
+        """
+        matrix = self.interpolation_matrix_for(wavelengths)
+        intensities = np.asarray(intensities, dtype=float)
+        if intensities.ndim == 1:
+            return matrix @ intensities
+        return (matrix @ intensities.T).T
+
+    def predict(self, raw_spectrum):
+        """
+        Predicts SOC for a spectrum given as (wavelength, intensity) pairs.
+        """
+        raw = np.asarray(raw_spectrum, dtype=float)
+        aligned_intensities = self.align(raw[:, 0], raw[:, 1])
+        aligned_intensities = snv(aligned_intensities)
+
+        predicted_value = np.dot(aligned_intensities, self.coefficients) + self.constant
+        return predicted_value * self.scale
+
+    def predict_matrix(self, wavelengths, intensities):
+        """
+        Predicts SOC for N spectra sharing one wavelength axis.
+
+        Args:
+            wavelengths: Shared source grid of length M.
+            intensities: (N x M) matrix, one spectrum per row.
+
+        Returns:
+            np.ndarray: N predicted values.
+        """
+        intensities = np.atleast_2d(np.asarray(intensities, dtype=float))
+        aligned = self.align(wavelengths, intensities)
+        return (snv_rows(aligned) @ self.coefficients + self.constant) * self.scale
+
+    def predict_batch(self, spectra):
+        """
+        Predicts SOC for a list of spectra that may have different lengths and grids.
+        Spectra are (wavelength, intensity) pairs or (M x 2) arrays; those sharing an
+        identical wavelength axis are stacked and scored together with predict_matrix.
+
+        Returns:
+            np.ndarray: One predicted value per input spectrum, in input order.
+        """
+        groups = {}
+        for idx, spectrum in enumerate(spectra):
+            arr = np.asarray(spectrum, dtype=float)
+            key = (arr.shape[0], arr[:, 0].tobytes())
+            groups.setdefault(key, []).append((idx, arr))
+
+        predictions = np.empty(len(spectra))
+        for members in groups.values():
+            indices = [idx for idx, _ in members]
+            grid = members[0][1][:, 0]
+            matrix = np.stack([arr[:, 1] for _, arr in members])
+            predictions[indices] = self.predict_matrix(grid, matrix)
+        return predictions
+
+
+def load_calibration_model(path):
+    """
+    Returns the CalibrationModel for the given CSV, re-reading it only if the file changed on disk.
+    """
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+
+    cached = _MODEL_CACHE.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    model = CalibrationModel.from_csv(path)
+    _MODEL_CACHE[path] = (mtime, model)
+    return model
+
+
 def apply_calibrated_model(raw_spectrum, calib_path):
-    raw_wavelengths, raw_intensities = zip(*raw_spectrum)
-    raw_wavelengths = np.array(raw_wavelengths)
-    raw_intensities = np.array(raw_intensities)
+    return load_calibration_model(calib_path).predict(raw_spectrum)
 
-    calib_wavelengths, calib_coeffs, calib_const = load_calibration_csv(calib_path)
-    aligned_intensities = interpolate_spectrum(raw_wavelengths, raw_intensities, calib_wavelengths)
-    aligned_intensities = snv(aligned_intensities)
 
-    predicted_value = np.dot(aligned_intensities, calib_coeffs) + calib_const
-    predicted_value *= 0.1 # Assuming we are expecting ~4.18 instead of ~41.8
-    return predicted_value
\ No newline at end of file
+def apply_calibrated_model_batch(raw_spectra, calib_path):
+    return load_calibration_model(calib_path).predict_batch(raw_spectra)
@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import signal
+import logging
+import threading
+from collections import deque
+
+# Settings keys accepted by AoDAQClient.run_acquisition
+SETTINGS_KEYS = ("gain_level", "apodization", "num_averages", "is_igm_avg", "message",
+                 "block_averages", "soc_tolerance", "noise_tolerance", "sample_type")
+MAX_CYCLE_RECORDS = 100  # most recent cycle records kept in memory
+
+
+class AcquisitionDaemon:
+    """
+    Keeps one AoDAQ connection open and takes acquisitions every `interval` seconds and/or
+    whenever request_acquisition() is called (SIGUSR1 when run from automate_aodaq.py).
+
+    Settings come from the constructor and, if settings_file is given, are re-read from that
+    JSON file before every cycle; AoDAQClient.configure only re-sends the ones that changed.
+    """
+
+    def __init__(self, client, settings, interval=None, settings_file=None, ensure_server=None):
+        """
+        Args:
+            client (AoDAQClient): Client to acquire with; connected on demand.
+            settings (dict): Default keyword arguments for run_acquisition.
+            interval (float): Seconds between cycle starts, or None for on-demand only.
+            settings_file (str): Optional JSON file overriding `settings`, re-read each cycle.
+            ensure_server (callable): Optional hook called before each cycle; should return
+                False if the AoDAQ server is not available (e.g. restart it if it exited).
+        """
+        self.client = client
+        self.settings = dict(settings)
+        self.interval = interval
+        self.settings_file = settings_file
+        self.ensure_server = ensure_server
+        self.cycles = deque(maxlen=MAX_CYCLE_RECORDS)  # most recent cycle records
+        self.cycle_count = 0
+        self._trigger = threading.Event()
+        self._stopping = threading.Event()
+
+    def request_acquisition(self):
+        self._trigger.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._trigger.set()
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self.request_acquisition())
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+
+    def current_settings(self) -> dict:
+        settings = dict(self.settings)
+        if self.settings_file and os.path.exists(self.settings_file):
+            try:
+                with open(self.settings_file) as f:
+                    overrides = json.load(f)
+                settings.update({k: v for k, v in overrides.items() if k in SETTINGS_KEYS})
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable settings file {self.settings_file}: {e}")
+        return settings
+
+    def run_cycle(self):
+        """Runs one acquisition, reconnecting first if needed. Returns the cycle record."""
+        start = time.monotonic()
+        record = {"started": time.time(), "ok": False}
+        try:
+            if self.ensure_server is not None and not self.ensure_server():
+                raise RuntimeError("AoDAQ server not available")
+            if self.client.sock is None:
+                self.client.connect()
+
+            result = self.client.run_acquisition(**self.current_settings())
+            if result is not None:
+                record.update(result)
+                record["ok"] = True
+        except Exception as e:
+            record["error"] = str(e)
+            logging.error(f"Acquisition cycle failed: {e}")
+            self.client.close()  # reconnect on the next cycle
+        record["cycle_s"] = time.monotonic() - start
+
+        self.cycles.append(record)
+        self.cycle_count += 1
+        phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in record.get("timings", {}).items())
+        logging.info(f"Cycle {self.cycle_count} {'ok' if record['ok'] else 'failed'} in {record['cycle_s']:.2f}s"
+                     + (f" ({phases})" if phases else ""))
+        return record
+
+    def run(self, max_cycles=None):
+        """Runs until stop() is called or max_cycles cycles have completed."""
+        logging.info(f"Acquisition daemon started (interval: {self.interval or 'on demand'})")
+        try:
+            while not self._stopping.is_set():
+                if self.interval is None:
+                    self._trigger.wait()
+                    self._trigger.clear()
+                    if self._stopping.is_set():
+                        break
+
+                # Scheduled runs start one interval after the previous start, not its end
+                cycle_start = time.monotonic()
+                self.run_cycle()
+                if max_cycles is not None and self.cycle_count >= max_cycles:
+                    break
+
+                if self.interval is not None:
+                    self._trigger.wait(max(0.0, self.interval - (time.monotonic() - cycle_start)))
+                    self._trigger.clear()
+        finally:
+            self.client.close()
+            logging.info(f"Acquisition daemon stopped after {self.cycle_count} cycles.")
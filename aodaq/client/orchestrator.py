@@ -0,0 +1,191 @@
+import time
+import shlex
+import asyncio
+import logging
+import argparse
+from AoDAQClient import DEVICE_NAME, GAIN_MAP
+from async_client import AsyncAoDAQClient, predict_and_upload
+from automate_aodaq import (
+    AODAQ_EXECUTABLE, AODAQ_HOST, AODAQ_PORT, AODAQ_PORT_ARGS, start_aodaq, stop_aodaq, wait_for_aodaq,
+)
+
+# --- Configuration ---
+MAX_RESTARTS = 3  # per instrument, before it is given up on
+
+
+class InstrumentStats:
+    def __init__(self, name, port):
+        self.name = name
+        self.port = port
+        self.acquisitions = 0
+        self.failures = 0
+        self.restarts = 0
+        self.cycle_times = []
+        self.last_error = None
+        self.started = time.monotonic()
+
+    def summary(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        return {
+            "name": self.name,
+            "port": self.port,
+            "acquisitions": self.acquisitions,
+            "failures": self.failures,
+            "restarts": self.restarts,
+            "mean_cycle_s": sum(self.cycle_times) / len(self.cycle_times) if self.cycle_times else None,
+            "per_hour": self.acquisitions * 3600.0 / elapsed if elapsed > 0 else 0.0,
+            "last_error": self.last_error,
+        }
+
+
+class Instrument:
+    """
+    One spectrometer: its AoDAQ server process (unless attached to an existing one),
+    its client connection and its running stats.
+    """
+
+    def __init__(self, index, port, host=AODAQ_HOST, executable=AODAQ_EXECUTABLE, spawn=True, port_args=None):
+        self.name = f"{DEVICE_NAME}-{index}"
+        self.host = host
+        self.port = port
+        self.executable = executable
+        self.spawn = spawn
+        self.port_args = port_args
+        self.process = None
+        self.client = None
+        self.stats = InstrumentStats(self.name, port)
+
+    async def ensure_running(self) -> bool:
+        """(Re)starts the server if it is not running and waits until it is ready."""
+        if self.spawn and (self.process is None or self.process.poll() is not None):
+            if self.process is not None:
+                if self.stats.restarts >= MAX_RESTARTS:
+                    return False
+                self.stats.restarts += 1
+                logging.warning(f"[{self.name}] AoDAQ exited with {self.process.returncode}, restarting...")
+                await self.disconnect()
+            self.process = start_aodaq(self.executable, self.port, label=f"AoDAQ:{self.port}",
+                                       port_args=self.port_args)
+            if not await asyncio.to_thread(wait_for_aodaq, self.host, self.port):
+                return False
+
+        if self.client is None:
+            self.client = AsyncAoDAQClient(self.host, self.port, device_name=self.name)
+            await self.client.connect()
+        return True
+
+    async def disconnect(self):
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    async def shutdown(self):
+        await self.disconnect()
+        if self.spawn and self.process is not None:
+            await asyncio.to_thread(stop_aodaq, self.process)
+
+
+async def run_instrument(instrument, settings, cycles):
+    """
+    Runs `cycles` acquisitions on one instrument. Each spectrum is predicted and uploaded in a
+    worker thread while the next acquisition proceeds; failures are counted, not raised.
+    """
+    settings = dict(settings)
+    message = settings.pop("message", "")
+    uploads_pending = []
+
+    for cycle in range(cycles):
+        start = time.monotonic()
+        try:
+            if not await instrument.ensure_running():
+                instrument.stats.failures += 1
+                instrument.stats.last_error = "AoDAQ server not available"
+                logging.error(f"[{instrument.name}] Giving up: AoDAQ server not available.")
+                break
+
+            spectrum, saturation = await instrument.client.acquire(**settings)
+            if spectrum is None or not len(spectrum):
+                raise RuntimeError("no valid spectrum data")
+
+            device_id_tag = instrument.client.device_id_tag(settings, message)
+            acquisition = instrument.client.acquisition_fields(settings, message, saturation)
+            uploads_pending.append(asyncio.create_task(
+                asyncio.to_thread(predict_and_upload, spectrum.copy(), device_id_tag, acquisition)
+            ))
+            instrument.stats.acquisitions += 1
+        except Exception as e:
+            instrument.stats.failures += 1
+            instrument.stats.last_error = str(e)
+            logging.error(f"[{instrument.name}] Cycle {cycle + 1} failed: {e}")
+            await instrument.disconnect()  # reconnect on the next cycle
+        finally:
+            instrument.stats.cycle_times.append(time.monotonic() - start)
+
+    for spectrum_id in await asyncio.gather(*uploads_pending):
+        if spectrum_id is None:
+            instrument.stats.failures += 1
+            instrument.stats.last_error = "upload failed"
+
+
+async def orchestrate(num_instruments, settings, cycles=1, base_port=AODAQ_PORT, host=AODAQ_HOST,
+                      executable=AODAQ_EXECUTABLE, spawn=True, port_args=None):
+    """
+    Starts `num_instruments` AoDAQ servers on consecutive ports from base_port (or attaches to
+    already-running ones if spawn is False) and runs acquisitions on all of them in parallel.
+    Spawning on any port but AODAQ_PORT needs port_args (default AODAQ_PORT_ARGS), see
+    start_aodaq; ValueError is raised up front if they are missing.
+
+    Returns:
+        list[dict]: Per-instrument summaries, see InstrumentStats.summary.
+    """
+    port_args = AODAQ_PORT_ARGS if port_args is None else port_args
+    ports = [base_port + i for i in range(num_instruments)]
+    if spawn and not port_args and any(port != AODAQ_PORT for port in ports):
+        raise ValueError(f"Spawning AoDAQ on ports {ports} needs port arguments (--port-args or AODAQ_PORT_ARGS); "
+                         f"only port {AODAQ_PORT} works without them. Use --no-spawn to attach to running servers.")
+    instruments = [
+        Instrument(i, port, host=host, executable=executable, spawn=spawn, port_args=port_args)
+        for i, port in enumerate(ports)
+    ]
+    try:
+        await asyncio.gather(*(run_instrument(instrument, settings, cycles) for instrument in instruments))
+    finally:
+        await asyncio.gather(*(instrument.shutdown() for instrument in instruments), return_exceptions=True)
+
+    report = [instrument.stats.summary() for instrument in instruments]
+    for row in report:
+        mean_cycle = f"{row['mean_cycle_s']:.1f}s" if row["mean_cycle_s"] is not None else "—"
+        logging.info(
+            f"[{row['name']}:{row['port']}] {row['acquisitions']} ok, {row['failures']} failed, "
+            f"{row['restarts']} restarts, mean cycle {mean_cycle}, {row['per_hour']:.1f}/h"
+            + (f", last error: {row['last_error']}" if row["last_error"] else "")
+        )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run acquisitions on several AoDAQ instruments in parallel")
+    parser.add_argument("--instruments", type=int, default=2, help="Number of AoDAQ servers to run")
+    parser.add_argument("--base-port", type=int, default=AODAQ_PORT, help="Port of the first server; the rest follow")
+    parser.add_argument("--cycles", type=int, default=1, help="Acquisitions per instrument")
+    parser.add_argument("--no-spawn", action="store_true", help="Attach to servers that are already running")
+    parser.add_argument("--port-args", type=str, default=None,
+                        help='AoDAQ arguments selecting its port, "{port}" substituted (default: $AODAQ_PORT_ARGS)')
+    parser.add_argument("--msg", type=str, default="", help="Message to add to name of device")
+    parser.add_argument("--gain", type=str, default="High", choices=list(GAIN_MAP),
+                        help="Gain level (Auto is only supported by automate_aodaq.py)")
+    parser.add_argument("--apo", type=str, default="NortonBeerStrong", help="Apodization type")
+    parser.add_argument("--avg", type=int, default=100, help="Number of averages")
+    args = parser.parse_args()
+
+    settings = {"gain_level": args.gain, "apodization": args.apo, "num_averages": args.avg, "message": args.msg}
+    port_args = None if args.port_args is None else shlex.split(args.port_args)
+    try:
+        asyncio.run(orchestrate(args.instruments, settings, cycles=args.cycles, base_port=args.base_port,
+                                spawn=not args.no_spawn, port_args=port_args))
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Adaptive MEAS:REM? polling.
+
+Instead of polling every second, the client predicts when a measurement will finish from the
+time per average (scan) and sleeps until then, polling tightly only around the predicted end.
+The time per average comes from earlier measurements with the same settings (a
+ScanRateEstimator, optionally saved to JSON) and is corrected from the MEAS:REM? readings of
+the current measurement when they disagree with it.
+"""
+import os
+import json
+import time
+import logging
+import threading
+
+TIGHT_POLL_INTERVAL = 0.05  # seconds between polls once the measurement is due
+MAX_POLL_INTERVAL = 1.0  # cap on the back-off while no estimate is available or a measurement overruns
+MAX_SLEEP = 30.0  # longest single sleep, so long measurements still re-check the estimate
+END_MARGIN = 0.1  # wake up this long before the predicted end, to catch the last running reading
+EWMA_ALPHA = 0.3  # weight of the newest measurement in the stored estimate
+
+
+def scan_key(gain_level, apodization, num_averages, is_igm_avg=False) -> str:
+    return f"{gain_level}|{apodization}|{int(num_averages)}|{int(bool(is_igm_avg))}"
+
+
+class ScanRateEstimator:
+    """
+    Seconds per average for each acquisition setting (see scan_key), as an exponentially
+    weighted mean of completed measurements. Settings never measured fall back to the mean of
+    those with the same gain and apodization.
+    """
+
+    def __init__(self, path=None, alpha=EWMA_ALPHA):
+        self.path = path
+        self.alpha = alpha
+        self.rates = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.rates = {k: float(v) for k, v in json.load(f).items()}
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable scan rate file {path}: {e}")
+
+    def seconds_per_average(self, key):
+        with self._lock:
+            if key in self.rates:
+                return self.rates[key]
+            prefix = key.rsplit("|", 2)[0] + "|"
+            similar = [rate for k, rate in self.rates.items() if k.startswith(prefix)]
+            return sum(similar) / len(similar) if similar else None
+
+    def update(self, key, seconds_per_average):
+        with self._lock:
+            previous = self.rates.get(key)
+            self.rates[key] = seconds_per_average if previous is None else (
+                self.alpha * seconds_per_average + (1 - self.alpha) * previous)
+        self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            rates = dict(self.rates)
+        try:
+            with open(self.path, "w") as f:
+                json.dump(rates, f, indent=2)
+        except OSError as e:
+            logging.warning(f"Could not save scan rates to {self.path}: {e}")
+
+
+class CompletionPoller:
+    """
+    Decides how long to wait between MEAS:REM? polls of one measurement of `averages` scans
+    started at `started` (time.monotonic()).
+
+    Every reading bounds the time per average: with `done` scans finished after `elapsed`
+    seconds it lies in (elapsed / (done + 1), elapsed / done]. The prior is clamped to those
+    bounds, the client sleeps until END_MARGIN before the predicted end and then polls every
+    TIGHT_POLL_INTERVAL, so the last "still running" and the first "done" readings pin the
+    actual duration down for the next measurement.
+    """
+
+    def __init__(self, averages, started, prior=None):
+        self.averages = max(1, int(averages))
+        self.started = started
+        self.prior = prior
+        self.polls = 0
+        self.lower = 0.0
+        self.upper = float("inf")
+        self._backoff = TIGHT_POLL_INTERVAL
+
+    def _observe(self, remaining, now):
+        elapsed = now - self.started
+        done = min(max(self.averages - remaining, 0), self.averages)
+        if done > 0:
+            self.upper = min(self.upper, elapsed / done)
+        if remaining > 0:
+            self.lower = max(self.lower, elapsed / (done + 1))
+
+    @property
+    def rate(self):
+        """Current estimate of seconds per average, or None if there is nothing to go on yet."""
+        if self.prior is not None:
+            return min(max(self.prior, self.lower), self.upper)
+        return self.upper if self.upper != float("inf") else None
+
+    def next_delay(self, remaining, now=None) -> float:
+        """Seconds to sleep after a MEAS:REM? reading of `remaining` (> 0)."""
+        now = time.monotonic() if now is None else now
+        self.polls += 1
+        self._observe(remaining, now)
+
+        rate = self.rate
+        if rate is not None:
+            until_due = self.started + self.averages * rate - END_MARGIN - now
+            if until_due > TIGHT_POLL_INTERVAL:
+                return min(until_due, MAX_SLEEP)
+            if until_due > -rate:
+                return TIGHT_POLL_INTERVAL
+
+        # No estimate yet, or overrunning it by more than a scan: back off
+        delay = self._backoff
+        self._backoff = min(self._backoff * 2, MAX_POLL_INTERVAL)
+        return delay
+
+    def seconds_per_average(self, now=None) -> float:
+        """Time per average measured by this poller, once MEAS:REM? has reported completion."""
+        now = time.monotonic() if now is None else now
+        self._observe(0, now)
+        # Use the middle of the bounds when the polls bracketed the end closely, else the upper bound
+        if self.lower > 0.5 * self.upper:
+            return (self.lower + self.upper) / 2
+        return self.upper
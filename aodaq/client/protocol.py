@@ -0,0 +1,190 @@
+"""
+Response framing for the AoDAQ text protocol.
+
+The server answers every command with newline-terminated lines. Rather than sleeping and then
+reading until the socket goes quiet for seconds, the client feeds reply lines through a
+ResponseFramer which recognises when the reply to a given command is complete:
+
+    *IDN?          a line containing "ARCspectro"
+    TRAN:SPEC?     an OK line, then data lines; if a lone integer follows OK it is taken as the
+                   point count, otherwise the reply ends when the stream goes idle
+    other "...?"   an OK line followed by two more lines (label, value), as read by
+                   AoDAQClient.extract_value_after_ok
+    everything     an OK line
+    else
+
+A line starting with ERR ends any reply. If the server's reply does not match the expected
+shape, the idle timeout (no bytes for IDLE_TIMEOUT seconds after the first line) still ends it,
+so an unexpected format degrades to a short wait rather than a hang.
+"""
+import re
+import logging
+
+FRAMING_FRAMED = "framed"
+FRAMING_LEGACY = "legacy"  # sleep COMMAND_DELAY then read until the socket times out
+FRAMING_MODE = FRAMING_FRAMED
+
+IDLE_TIMEOUT = 0.5
+SPECTRUM_IDLE_TIMEOUT = 2.0
+
+KIND_IDN = "idn"
+KIND_ACK = "ack"
+KIND_VALUE = "value"
+KIND_SPECTRUM = "spectrum"
+
+VALUE_LINES_AFTER_OK = 2
+
+# Queries that only acknowledge, despite the trailing "?"
+ACK_QUERIES = {"SPEC:GET?"}
+
+
+def command_kind(command: str) -> str:
+    name = command.strip().split()[0].upper() if command.strip() else ""
+    if name == "*IDN?":
+        return KIND_IDN
+    if name == "TRAN:SPEC?":
+        return KIND_SPECTRUM
+    if name.endswith("?") and name not in ACK_QUERIES:
+        return KIND_VALUE
+    return KIND_ACK
+
+
+def is_data_line(line: bytes) -> bool:
+    parts = line.split()
+    if len(parts) != 2:
+        return False
+    try:
+        float(parts[0])
+        float(parts[1])
+    except ValueError:
+        return False
+    return True
+
+
+class LineBuffer:
+    """
+    Accumulates received bytes and hands them back one line at a time, for the blocking
+    client's framed reads. A recv() can return more than one reply; AoDAQClient._read_framed
+    drops whatever is still buffered once the reply it is reading is complete.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes):
+        self._buffer += data
+
+    def next_line(self):
+        """Returns the next complete line without its terminator, or None if there is none yet."""
+        end = self._buffer.find(b"\n")
+        if end < 0:
+            return None
+        line = bytes(self._buffer[:end]).rstrip(b"\r")
+        del self._buffer[:end + 1]
+        return line
+
+    def take_partial(self) -> bytes:
+        """Returns and clears whatever is left without a trailing newline."""
+        partial = bytes(self._buffer)
+        self._buffer.clear()
+        return partial
+
+    def clear(self):
+        self._buffer.clear()
+
+
+class ResponseFramer:
+    """
+    Decides, line by line, when the reply to one command is complete.
+    Spectrum data lines are counted but not stored; every other line is kept in self.lines.
+    """
+
+    def __init__(self, command: str):
+        self.command = command
+        self.kind = command_kind(command)
+        self.lines = []
+        self.lines_seen = 0
+        self.data_lines = 0
+        self.complete = False
+        self._ok_index = None
+        self._expected_points = None
+
+    @property
+    def idle_timeout(self):
+        return SPECTRUM_IDLE_TIMEOUT if self.kind == KIND_SPECTRUM else IDLE_TIMEOUT
+
+    @property
+    def expected_points(self):
+        """Point count announced before the spectrum data (TRAN:LEN 1), or None if none was."""
+        return self._expected_points
+
+    def text(self) -> str:
+        return "\n".join(self.lines).strip()
+
+    def feed_line(self, line: bytes) -> bool:
+        """Consumes one reply line and returns True once the reply is complete."""
+        self.lines_seen += 1
+
+        if self.kind == KIND_SPECTRUM and self._ok_index is not None and is_data_line(line):
+            self.data_lines += 1
+            self.complete = self._expected_points is not None and self.data_lines >= self._expected_points
+            return self.complete
+
+        text = line.decode("utf-8", errors="replace").strip()
+        self.lines.append(text)
+        upper = text.upper()
+
+        if upper.startswith("ERR"):
+            self.complete = True
+        elif self.kind == KIND_IDN:
+            self.complete = "ARCspectro" in text
+        elif self._ok_index is None:
+            if "OK" in upper:
+                self._ok_index = len(self.lines) - 1
+                self.complete = self.kind == KIND_ACK
+        elif self.kind == KIND_VALUE:
+            self.complete = len(self.lines) - 1 - self._ok_index >= VALUE_LINES_AFTER_OK
+        elif self.kind == KIND_SPECTRUM and self.data_lines == 0 and text.isdigit():
+            # TRAN:LEN 1 announces the number of points before the data
+            self._expected_points = int(text)
+            self.complete = self._expected_points == 0
+
+        return self.complete
+
+    def matches_command(self) -> bool:
+        """
+        True if the complete reply has the shape expected for this command: it starts with OK
+        (or is an ERR line) and a value reply echoes the queried name after the OK, e.g.
+        "OK / MEAS:REM / 3" for MEAS:REM?. Pipelined replies that fail this were misaligned.
+        """
+        if not self.complete or not self.lines:
+            return False
+        first = self.lines[0].upper()
+        if first.startswith("ERR"):
+            return True
+        if self.kind == KIND_IDN:
+            return "ARCspectro" in self.lines[0]
+        if self._ok_index != 0:
+            return False
+        if self.kind == KIND_VALUE:
+            name = self.command.strip().split()[0].upper()[:-1]
+            return len(self.lines) > 1 and self.lines[1].upper() == name
+        return True
+
+
+def extract_value_after_ok(response: str, as_type=int):
+    """
+    Parses the second line after 'OK' in a multi-line AoDAQ response,
+    cleans non-numeric characters, and casts to the given type.
+    """
+    lines = response.splitlines()
+    for idx, line in enumerate(lines):
+        if "OK" in line and idx + 2 < len(lines):
+            val = lines[idx + 2].strip()
+            val_clean = re.sub(r"[^\d.eE+-]", "", val)
+            try:
+                return as_type(val_clean)
+            except ValueError:
+                logging.warning(f"Failed to cast value: {val_clean}")
+                return None
+    return None
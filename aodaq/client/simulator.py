@@ -0,0 +1,236 @@
+"""
+Local stand-in for the AoDAQ server, speaking the text protocol described in protocol.py.
+
+It implements the commands the clients use (*IDN?, STAT:INIT?, TRAN:*, SPEC:WLG, GAIN:SET,
+SPEC:APO, SPEC:AVG, IFGM:AVG, SPEC:GET?, MEAS:REM?, SPEC:SAT?, TRAN:SPEC?) with a simple
+detector model: the signal scales with gain and clips at full scale, each scan takes
+scan_time seconds and the noise falls with the square root of the number of averages.
+Response latency and faults (dropped, erroneous or truncated replies, disconnects) can be
+injected to exercise the client's framing and retry paths.
+
+    python simulator.py --port 1242 --points 2000 --latency 0.005 --scan-time 0.05
+"""
+import time
+import random
+import logging
+import argparse
+import threading
+import socketserver
+import numpy as np
+
+# --- Configuration ---
+SIM_HOST = "127.0.0.1"
+SIM_PORT = 1242
+IDN_REPLY = "ARCspectro FT-Rocket simulator"
+GAIN_FACTORS = [1.0, 2.0, 4.0, 8.0]  # detector gain per GAIN:SET level 0-3
+WAVELENGTH_RANGE = (900.0, 2600.0)
+
+
+class SimulatedDevice:
+    """
+    Acquisition state of one simulated spectrometer, shared by all connections to it.
+    """
+
+    def __init__(self, points=2000, scan_time=0.05, init_time=0.0, brightness=0.2, noise=0.01, seed=None):
+        self.points = points
+        self.scan_time = scan_time
+        self.brightness = brightness  # peak signal at gain 1, as a fraction of full scale
+        self.noise = noise  # per-scan noise, as a fraction of full scale
+        self.started = time.monotonic()
+        self.init_time = init_time
+        self.settings = {"GAIN:SET": 0, "SPEC:APO": 3, "SPEC:AVG": 5, "IFGM:AVG": 1, "TRAN:LEN": 1, "TRAN:BIN": 0,
+                         "TRAN:SABS": 1, "SPEC:WLG": 1}
+        self.rng = np.random.default_rng(seed)
+        self.wavelengths = np.linspace(*WAVELENGTH_RANGE, points)
+        # Smooth reflectance-like shape in (0, 1]: a few absorption bands on a sloping baseline
+        shape = 0.8 + 0.2 * np.linspace(0.0, 1.0, points)
+        for centre, width, depth in ((1400.0, 40.0, 0.35), (1900.0, 60.0, 0.45), (2200.0, 50.0, 0.2)):
+            shape -= depth * np.exp(-0.5 * ((self.wavelengths - centre) / width) ** 2)
+        self.shape = shape / shape.max()
+        self._measurement = None  # (start, averages, settings snapshot)
+        self._last = None  # (intensities, saturation) of the last finished measurement
+        self._lock = threading.Lock()
+
+    def initialising(self) -> bool:
+        return time.monotonic() - self.started < self.init_time
+
+    def set(self, name, value):
+        with self._lock:
+            self.settings[name] = value
+
+    def start(self):
+        with self._lock:
+            self._measurement = (time.monotonic(), max(1, self.settings["SPEC:AVG"]), dict(self.settings))
+            self._last = None
+
+    def remaining(self) -> int:
+        with self._lock:
+            if self._measurement is None:
+                return 0
+            start, averages, _ = self._measurement
+            done = int((time.monotonic() - start) / self.scan_time) if self.scan_time > 0 else averages
+            return max(0, averages - done)
+
+    def result(self):
+        """(intensities, saturation) of the finished measurement, computed once."""
+        with self._lock:
+            if self._last is None:
+                settings = self._measurement[2] if self._measurement else self.settings
+                gain = GAIN_FACTORS[min(max(settings["GAIN:SET"], 0), len(GAIN_FACTORS) - 1)]
+                averages = max(1, settings["SPEC:AVG"])
+                signal = self.brightness * gain * self.shape
+                noisy = signal + self.rng.normal(0.0, self.noise * gain / np.sqrt(averages), self.points)
+                saturation = float(min(1.0, max(0.0, noisy.max())))
+                self._last = (np.clip(noisy, 0.0, 1.0), saturation)
+            return self._last
+
+
+class SimulatorHandler(socketserver.StreamRequestHandler):
+    """Serves one client connection, one command per line."""
+
+    def handle(self):
+        server = self.server
+        for raw in self.rfile:
+            command = raw.decode("utf-8", errors="replace").strip()
+            if not command:
+                continue
+            server.stats["commands"] += 1
+
+            fault = server.pick_fault()
+            if fault == "disconnect":
+                return
+            if server.latency or server.jitter:
+                time.sleep(server.latency + server.jitter * server.uniform())
+            if fault == "drop":
+                continue
+            if fault == "error":
+                self.wfile.write(b"ERR simulated fault\n")
+                continue
+
+            try:
+                self.wfile.write(self.reply(command, truncate=fault == "truncate"))
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
+    def reply(self, command, truncate=False) -> bytes:
+        device = self.server.device
+        name, _, argument = command.partition(" ")
+        name = name.upper()
+
+        if name == "*IDN?":
+            return f"{IDN_REPLY}\n".encode()
+        if name == "STAT:INIT?":
+            return f"OK\nSTAT:INIT\n{1 if device.initialising() else 0}\n".encode()
+        if name == "SPEC:GET?":
+            device.start()
+            return b"OK\n"
+        if name == "MEAS:REM?":
+            return f"OK\nMEAS:REM\n{device.remaining()}\n".encode()
+        if name == "SPEC:SAT?":
+            return f"OK\nSPEC:SAT\n{device.result()[1]:.4f}\n".encode()
+        if name == "TRAN:SPEC?":
+            return self.spectrum_reply(truncate)
+        if name in device.settings and argument:
+            try:
+                device.set(name, int(argument))
+            except ValueError:
+                return f"ERR bad argument: {argument}\n".encode()
+            return b"OK\n"
+        if name.endswith("?") and name[:-1] in device.settings:
+            return f"OK\n{name[:-1]}\n{device.settings[name[:-1]]}\n".encode()
+        return f"ERR unknown command: {command}\n".encode()
+
+    def spectrum_reply(self, truncate) -> bytes:
+        device = self.server.device
+        intensities, _ = device.result()
+        lines = [f"{w:.4f} {i:.6e}" for w, i in zip(device.wavelengths, intensities)]
+        if truncate:
+            lines = lines[:len(lines) // 2]
+        header = f"OK\n{device.points}\n" if device.settings["TRAN:LEN"] else "OK\n"
+        return (header + "\n".join(lines) + "\n").encode()
+
+
+class AoDAQSimulator(socketserver.ThreadingTCPServer):
+    """
+    A threaded TCP server emulating AoDAQ. Use port=0 to pick a free port (see .port).
+
+    Faults are given as per-command probabilities: drop (no reply), error (an ERR line),
+    truncate (TRAN:SPEC? stops halfway) and disconnect (the connection is closed).
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host=SIM_HOST, port=0, latency=0.0, jitter=0.0, faults=None, seed=None, **device_options):
+        super().__init__((host, port), SimulatorHandler)
+        self.device = SimulatedDevice(seed=seed, **device_options)
+        self.latency = latency
+        self.jitter = jitter
+        self.faults = dict(faults or {})
+        self.stats = {"commands": 0, "faults": 0}
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def uniform(self):
+        with self._random_lock:
+            return self._random.random()
+
+    def pick_fault(self):
+        roll = self.uniform()
+        for fault, probability in self.faults.items():
+            if roll < probability:
+                self.stats["faults"] += 1
+                return fault
+            roll -= probability
+        return None
+
+    def start(self):
+        """Serves from a background thread; returns self."""
+        self._thread = threading.Thread(target=self.serve_forever, name="aodaq-simulator", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a simulated AoDAQ server")
+    parser.add_argument("--host", type=str, default=SIM_HOST)
+    parser.add_argument("--port", type=int, default=SIM_PORT)
+    parser.add_argument("--points", type=int, default=2000, help="Points per spectrum")
+    parser.add_argument("--scan-time", type=float, default=0.05, help="Seconds per averaged scan")
+    parser.add_argument("--init-time", type=float, default=0.0, help="Seconds STAT:INIT? reports initialising")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each reply")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency, up to this many seconds")
+    parser.add_argument("--drop", type=float, default=0.0, help="Probability a reply is dropped")
+    parser.add_argument("--error", type=float, default=0.0, help="Probability a reply is an ERR line")
+    parser.add_argument("--truncate", type=float, default=0.0, help="Probability a spectrum reply is cut short")
+    parser.add_argument("--disconnect", type=float, default=0.0, help="Probability the connection is closed")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    faults = {"drop": args.drop, "error": args.error, "truncate": args.truncate, "disconnect": args.disconnect}
+    server = AoDAQSimulator(
+        args.host, args.port, latency=args.latency, jitter=args.jitter,
+        faults={fault: p for fault, p in faults.items() if p > 0}, seed=args.seed,
+        points=args.points, scan_time=args.scan_time, init_time=args.init_time,
+    )
+    logging.info(f"AoDAQ simulator listening on {args.host}:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Client side of the compact binary spectrum upload format.
+The layout is documented in backend/api/core/codec.py and must stay in sync with it.
+"""
+import gzip
+import json
+import struct
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SPECTRUM_CONTENT_TYPE = "application/x-spectrum"
+
+MAGIC = b"SPEC"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBxII")
+
+COMPRESSION_CODES = {None: 0, "gzip": 1, "zstd": 2}
+DTYPES = {4: "<f4", 8: "<f8"}
+
+
+def encode_spectrum(wavelengths, intensities, metadata=None, value_size=8, compression=None) -> bytes:
+    """
+    Packs a spectrum into the binary upload format.
+
+    Args:
+        wavelengths, intensities: Equal-length sequences of numbers.
+        metadata (dict): JSON-serialisable fields sent alongside the arrays (e.g. device_id).
+        value_size (int): 8 for float64, 4 for float32 (halves the payload, ~7 significant digits).
+        compression (str): None, "gzip" or "zstd" (requires the zstandard package).
+
+    Returns:
+        bytes: The encoded request body.
+    """
+    if value_size not in DTYPES:
+        raise ValueError(f"Unsupported value size: {value_size}")
+    if compression not in COMPRESSION_CODES:
+        raise ValueError(f"Unsupported compression: {compression}")
+
+    dtype = DTYPES[value_size]
+    wavelengths = np.asarray(wavelengths, dtype=dtype)
+    intensities = np.asarray(intensities, dtype=dtype)
+    if wavelengths.shape != intensities.shape or wavelengths.ndim != 1:
+        raise ValueError("wavelengths and intensities must be 1-D arrays of equal length")
+
+    payload = wavelengths.tobytes() + intensities.tobytes()
+    if compression == "gzip":
+        payload = gzip.compress(payload)
+    elif compression == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        payload = zstandard.ZstdCompressor().compress(payload)
+
+    meta = json.dumps(metadata or {}).encode("utf-8")
+    header = HEADER.pack(MAGIC, VERSION, value_size, COMPRESSION_CODES[compression], len(wavelengths), len(meta))
+    return header + meta + payload
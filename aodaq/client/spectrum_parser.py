@@ -0,0 +1,68 @@
+import numpy as np
+
+DEFAULT_CAPACITY = 4096  # points; grows by doubling if the spectrum is longer
+MAX_HEADER_LINES = 8
+
+
+class SpectrumStreamParser:
+    """
+    Incremental parser for the TRAN:SPEC? reply.
+
+    Feed it raw socket chunks as they arrive; every complete "<wavelength> <intensity>" line is
+    written straight into preallocated float64 arrays, so the reply is never held as one big
+    string and parsing overlaps the transfer. Non-numeric lines (OK, headers) are kept aside.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self._data = np.empty((max(capacity, 1), 2), dtype=float)
+        self._count = 0
+        self._partial = b""
+        self.header_lines = []
+
+    def __len__(self):
+        return self._count
+
+    def feed(self, chunk: bytes):
+        lines = (self._partial + chunk).split(b"\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self.parse_line(line)
+
+    def close(self):
+        """Parses a final line that arrived without a trailing newline."""
+        if self._partial:
+            self.parse_line(self._partial)
+            self._partial = b""
+
+    def spectrum(self) -> np.ndarray:
+        """
+        Returns the parsed points as an (N x 2) array of (wavelength, intensity) rows.
+        Rows unpack like the list of tuples parse_spectrum_data returns.
+        """
+        return self._data[:self._count]
+
+    def parse_line(self, line: bytes):
+        """Parses one complete line, without its newline."""
+        parts = line.split()
+        if len(parts) == 2:
+            try:
+                wavelength = float(parts[0])
+                intensity = float(parts[1])
+            except ValueError:
+                pass
+            else:
+                self._append(wavelength, intensity)
+                return
+
+        stripped = line.strip()
+        if stripped and len(self.header_lines) < MAX_HEADER_LINES:
+            self.header_lines.append(stripped.decode("utf-8", errors="replace"))
+
+    def _append(self, wavelength, intensity):
+        if self._count == len(self._data):
+            grown = np.empty((2 * len(self._data), 2), dtype=float)
+            grown[:self._count] = self._data
+            self._data = grown
+        self._data[self._count, 0] = wavelength
+        self._data[self._count, 1] = intensity
+        self._count += 1
@@ -0,0 +1,223 @@
+import json
+import uuid
+import time
+import sqlite3
+import logging
+import threading
+import requests
+import numpy as np
+from requests.adapters import HTTPAdapter
+import uploads
+
+# --- Configuration ---
+DEFAULT_SPOOL_PATH = "upload_spool.sqlite3"
+BATCH_SIZE = 20
+RETRY_BASE_DELAY = 5.0  # seconds, doubled per failed attempt
+RETRY_MAX_DELAY = 15 * 60.0
+MAX_ATTEMPTS = 50  # records that keep failing stay in the spool but are no longer retried
+IDLE_POLL = 30.0  # seconds between spool checks when nothing new was queued
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    device_id TEXT NOT NULL,
+    wavelengths BLOB NOT NULL,
+    intensities BLOB NOT NULL,
+    predicted_value REAL,
+    model_version TEXT,
+    acquisition TEXT,
+    spectrum_id TEXT,
+    upload_id TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS records_due ON records (next_attempt);
+"""
+
+
+class UploadSpool:
+    """
+    Durable local queue of spectrum + prediction records awaiting upload, backed by SQLite.
+    A record is deleted only once both its spectrum and its prediction have been accepted.
+    Each record gets a UUID when spooled and sends it as the spectrum id, so an upload retried
+    after a timeout that the server had in fact committed is not stored twice.
+    """
+
+    def __init__(self, path=DEFAULT_SPOOL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        # Spool files written by older clients lack the later columns
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(records)")}
+        for column in ("model_version", "acquisition", "upload_id"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE records ADD COLUMN {column} TEXT")
+        for (record_id,) in self._conn.execute("SELECT id FROM records WHERE upload_id IS NULL").fetchall():
+            self._conn.execute("UPDATE records SET upload_id = ? WHERE id = ?", (str(uuid.uuid4()), record_id))
+        self.queued = threading.Event()
+
+    def put(self, spectrum, device_id, predicted_value=None, model_version=None, acquisition=None) -> int:
+        spectrum = np.asarray(spectrum, dtype="<f8")
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO records (created, device_id, wavelengths, intensities, predicted_value, model_version, "
+                "acquisition, upload_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), device_id, spectrum[:, 0].tobytes(), spectrum[:, 1].tobytes(),
+                 None if predicted_value is None else float(predicted_value), model_version,
+                 None if acquisition is None else json.dumps(acquisition), str(uuid.uuid4())),
+            )
+        self.queued.set()
+        logging.info(f"Spooled spectrum for upload (record {cursor.lastrowid}).")
+        return cursor.lastrowid
+
+    def due(self, limit=BATCH_SIZE) -> list:
+        """Returns up to `limit` records whose next attempt is due, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, device_id, wavelengths, intensities, predicted_value, model_version, acquisition, spectrum_id, "
+                "attempts, upload_id "
+                "FROM records WHERE next_attempt <= ? AND attempts < ? ORDER BY id LIMIT ?",
+                (time.time(), MAX_ATTEMPTS, limit),
+            ).fetchall()
+        return [
+            {
+                "id": row[0],
+                "device_id": row[1],
+                "spectrum": np.column_stack((np.frombuffer(row[2], dtype="<f8"), np.frombuffer(row[3], dtype="<f8"))),
+                "predicted_value": row[4],
+                "model_version": row[5],
+                "acquisition": None if row[6] is None else json.loads(row[6]),
+                "spectrum_id": row[7],
+                "attempts": row[8],
+                "upload_id": row[9],
+            }
+            for row in rows
+        ]
+
+    def mark_spectrum_uploaded(self, record_id, spectrum_id):
+        with self._lock:
+            self._conn.execute("UPDATE records SET spectrum_id = ? WHERE id = ?", (spectrum_id, record_id))
+
+    def complete(self, record_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM records WHERE id = ?", (record_id,))
+
+    def fail(self, record_id, attempts, error):
+        delay = min(RETRY_BASE_DELAY * 2 ** attempts, RETRY_MAX_DELAY)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE records SET attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+                (attempts + 1, time.time() + delay, error, record_id),
+            )
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM records WHERE attempts < ?", (MAX_ATTEMPTS,)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def make_session(pool_size=4) -> requests.Session:
+    """A keep-alive session so successive uploads reuse one TLS connection to API Gateway."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class BackgroundUploader:
+    """
+    Drains an UploadSpool from a daemon thread, sending each batch of due records in one
+    request to the bulk endpoint and retrying failed records with exponential backoff. Acquisition only ever writes to the spool and never waits on it.
+    """
+
+    def __init__(self, spool, batch_size=BATCH_SIZE, session=None):
+        self.spool = spool
+        self.batch_size = batch_size
+        self.session = session or make_session()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="spool-uploader", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        self._stopping.set()
+        self.spool.queued.set()
+        self._thread.join(timeout)
+
+    def flush(self, timeout=60.0) -> bool:
+        """
+        Waits until every pending record is uploaded, including those still backing off after
+        a failure, or the timeout expires. Returns False if records remain.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.spool.pending_count() == 0:
+                return True
+            self.spool.queued.set()
+            time.sleep(0.2)
+        return self.spool.pending_count() == 0
+
+    def upload_record(self, record) -> bool:
+        """Uploads one record's spectrum (unless already done) and prediction."""
+        if record["spectrum_id"] is None:
+            # Spectrum and prediction go in one request and are stored together
+            spectrum_id = uploads.upload_spectrum(
+                record["spectrum"], device_id=record["device_id"], session=self.session,
+                predicted_value=record["predicted_value"], model_version=record["model_version"],
+                acquisition=record["acquisition"], spectrum_id=record["upload_id"]
+            )
+            if spectrum_id is None:
+                self.spool.fail(record["id"], record["attempts"], "spectrum upload failed")
+                return False
+        elif record["predicted_value"] is not None:
+            # Left by an earlier uploader that stored the spectrum on its own
+            if not uploads.upload_prediction(record["predicted_value"], record["spectrum_id"], record["device_id"],
+                                             session=self.session, model_version=record["model_version"]):
+                self.spool.fail(record["id"], record["attempts"], "prediction upload failed")
+                return False
+
+        self.spool.complete(record["id"])
+        return True
+
+    def drain_once(self) -> int:
+        """Uploads one batch of due records; returns how many were completed."""
+        records = self.spool.due(self.batch_size)
+        # Records whose spectrum is already stored only lack their prediction
+        fresh = [record for record in records if record["spectrum_id"] is None]
+        completed = 0
+
+        if fresh and not self._stopping.is_set():
+            spectrum_ids = uploads.upload_batch(fresh, session=self.session)
+            for record, spectrum_id in zip(fresh, spectrum_ids or [None] * len(fresh)):
+                if spectrum_id is None:
+                    self.spool.fail(record["id"], record["attempts"], "batch upload failed")
+                else:
+                    self.spool.complete(record["id"])
+                    completed += 1
+
+        for record in records:
+            if record["spectrum_id"] is None or self._stopping.is_set():
+                continue
+            try:
+                completed += self.upload_record(record)
+            except Exception as e:
+                logging.error(f"⚠️ Spool upload error for record {record['id']}: {e}")
+                self.spool.fail(record["id"], record["attempts"], str(e))
+        return completed
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self.spool.queued.clear()
+            batch_full = self.drain_once() >= self.batch_size
+            if not batch_full:
+                self.spool.queued.wait(IDLE_POLL)
@@ -0,0 +1,204 @@
+"""
+Structured timings for AoDAQClient.
+
+Every command gets one record: when it was sent, how long until the first and last reply
+byte, bytes received, retries and whether it succeeded. Acquisition phases (configure,
+acquire, wait, fetch, predict, upload, ...) and the client's own sleeps (retry back-off,
+MEAS:REM? polling, legacy COMMAND_DELAY) are recorded too, so a cycle can be split into
+device time and our own overhead.
+
+Records are kept in memory (the most recent MAX_RECORDS) for summary() / histogram() and,
+if a path is given, appended to a JSON lines file as they are made.
+"""
+import json
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+
+MAX_RECORDS = 10000
+
+KIND_COMMAND = "command"
+KIND_PHASE = "phase"
+KIND_SLEEP = "sleep"
+
+
+def command_name(command: str) -> str:
+    """The command without its arguments, e.g. "GAIN:SET 2" -> "GAIN:SET"."""
+    return command.strip().split()[0].upper() if command.strip() else ""
+
+
+class CommandTimer:
+    """Collects the timings of one command while it runs; see TimingRecorder.command."""
+
+    def __init__(self, command):
+        self.command = command
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self._sent = None
+        self._first_byte = None
+        self._last_byte = None
+        self.bytes = 0
+        self.retries = 0
+
+    def sent(self):
+        """
+        Marks the command as written to the socket (again, after a retry). Starts a new
+        attempt: reply timings and bytes only count what arrives after this.
+        """
+        self._sent = time.perf_counter()
+        self._first_byte = None
+        self._last_byte = None
+        self.bytes = 0
+
+    def received(self, num_bytes):
+        now = time.perf_counter()
+        if self._first_byte is None:
+            self._first_byte = now
+        self._last_byte = now
+        self.bytes += num_bytes
+
+    def retry(self):
+        self.retries += 1
+
+    def record(self, ok) -> dict:
+        end = time.perf_counter()
+        sent = self._sent if self._sent is not None else end
+
+        def since_sent(t):
+            return None if t is None else t - sent
+
+        return {
+            "kind": KIND_COMMAND,
+            "name": command_name(self.command),
+            "command": self.command,
+            "started": self.started,
+            "send_s": sent - self._start,
+            "first_byte_s": since_sent(self._first_byte),
+            "last_byte_s": since_sent(self._last_byte),
+            "duration_s": end - self._start,
+            "bytes": self.bytes,
+            "retries": self.retries,
+            "ok": bool(ok),
+        }
+
+
+class TimingRecorder:
+    """
+    In-memory store of timing records, optionally mirrored to a JSON lines file.
+
+    send_s, first/last_byte_s and bytes refer to the last attempt (first/last byte are
+    measured from when it was sent); duration_s covers all attempts, retry sleeps included.
+    """
+
+    def __init__(self, path=None, max_records=MAX_RECORDS):
+        self.path = path
+        self.records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+        self._file = None
+
+    def add(self, record):
+        with self._lock:
+            self.records.append(record)
+            if self.path is None:
+                return
+            try:
+                if self._file is None:
+                    self._file = open(self.path, "a", buffering=1)
+                self._file.write(json.dumps(record) + "\n")
+            except OSError as e:
+                logging.warning(f"Could not write timing record to {self.path}: {e}")
+
+    def command(self, command) -> CommandTimer:
+        """Starts timing a command; pass the timer to finish() when it is done."""
+        return CommandTimer(command)
+
+    def finish(self, timer, ok):
+        record = timer.record(ok)
+        self.add(record)
+        return record
+
+    @contextmanager
+    def phase(self, name, timings=None):
+        """
+        Times the enclosed block as a phase. If a dict is given, the duration is also stored
+        in it under `name` (run_acquisition returns such a dict).
+        """
+        started = time.time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            if timings is not None:
+                timings[name] = duration
+            self.add({"kind": KIND_PHASE, "name": name, "started": started, "duration_s": duration})
+
+    def sleep(self, seconds, reason):
+        """time.sleep, recorded so our own waiting shows up next to the device's."""
+        started = time.time()
+        start = time.perf_counter()
+        time.sleep(seconds)
+        self.add({"kind": KIND_SLEEP, "name": reason, "started": started,
+                  "duration_s": time.perf_counter() - start})
+
+    def durations(self, kind, name=None, field="duration_s"):
+        with self._lock:
+            return [r[field] for r in self.records
+                    if r["kind"] == kind and (name is None or r["name"] == name) and r.get(field) is not None]
+
+    def histogram(self, kind, name=None, bins=10, field="duration_s"):
+        """
+        Returns:
+            (np.ndarray, np.ndarray): Counts and bin edges (seconds) of the matching records,
+            as np.histogram.
+        """
+        return np.histogram(self.durations(kind, name, field), bins=bins)
+
+    def summary(self) -> dict:
+        """
+        Per-name statistics for each kind of record:
+            {"command": {"MEAS:REM?": {"count", "total_s", "mean_s", "p50_s", "p95_s", "max_s",
+                                       "first_byte_p50_s", "bytes", "retries", "failures"}, ...},
+             "phase": {...}, "sleep": {...}}
+        Phases and sleeps only have the count and duration statistics.
+        """
+        with self._lock:
+            records = list(self.records)
+
+        grouped = {}
+        for record in records:
+            grouped.setdefault(record["kind"], {}).setdefault(record["name"], []).append(record)
+
+        summary = {KIND_COMMAND: {}, KIND_PHASE: {}, KIND_SLEEP: {}}
+        for kind, by_name in grouped.items():
+            for name, group in by_name.items():
+                durations = np.array([r["duration_s"] for r in group])
+                stats = {
+                    "count": len(group),
+                    "total_s": float(durations.sum()),
+                    "mean_s": float(durations.mean()),
+                    "p50_s": float(np.percentile(durations, 50)),
+                    "p95_s": float(np.percentile(durations, 95)),
+                    "max_s": float(durations.max()),
+                }
+                if kind == KIND_COMMAND:
+                    first_bytes = [r["first_byte_s"] for r in group if r["first_byte_s"] is not None]
+                    stats["first_byte_p50_s"] = float(np.percentile(first_bytes, 50)) if first_bytes else None
+                    stats["bytes"] = sum(r["bytes"] for r in group)
+                    stats["retries"] = sum(r["retries"] for r in group)
+                    stats["failures"] = sum(1 for r in group if not r["ok"])
+                summary.setdefault(kind, {})[name] = stats
+        return summary
+
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,160 @@
+import json
+import logging
+import requests
+import numpy as np
+from spectrum_codec import SPECTRUM_CONTENT_TYPE, encode_spectrum
+
+# --- Configuration ---
+API_BASE_URL = "https://rekehtm1f0.execute-api.us-east-1.amazonaws.com/dev"
+SPECTRUM_UPLOAD_URL = f"{API_BASE_URL}/upload-spectrum/"
+PREDICTION_UPLOAD_URL = f"{API_BASE_URL}/upload-prediction/"
+BATCH_UPLOAD_URL = f"{API_BASE_URL}/upload-spectra/"
+UPLOAD_BINARY = True  # Send spectra in the compact binary format instead of JSON
+UPLOAD_COMPRESSION = None  # None, "gzip" or "zstd"
+UPLOAD_TIMEOUT = (5, 30)  # (connect, read) seconds, so a stalled API cannot hang the uploader
+
+
+def prediction_fields(device_id, predicted_value=None, model_version=None, acquisition=None):
+    """
+    The device_id plus, if present, the acquisition settings and prediction fields accepted
+    with a spectrum upload.
+    """
+    fields = {"device_id": device_id, **(acquisition or {})}
+    if predicted_value is not None:
+        fields["predicted_value"] = float(predicted_value)
+        if model_version:
+            fields["model_version"] = model_version
+    return fields
+
+
+def upload_spectrum(spectrum, api_url=SPECTRUM_UPLOAD_URL, device_id="pi-01", binary=UPLOAD_BINARY, session=None,
+                    predicted_value=None, model_version=None, acquisition=None, spectrum_id=None):
+    """
+    Upload the given spectrum data to the Django API.
+    If binary is set the body uses the compact format from spectrum_codec, otherwise JSON.
+    If predicted_value is given the prediction is stored in the same request and transaction.
+    acquisition is a dict of settings fields, see AoDAQClient.make_acquisition_fields.
+    spectrum_id is an optional UUID to store the spectrum under; re-sending the same id (e.g.
+    after a timeout) returns the stored spectrum instead of creating a copy.
+
+    Returns:
+        str: UUID of the stored spectrum, or None if the upload failed.
+    """
+    spectrum = np.asarray(spectrum, dtype=float)
+    wavelengths, intensities = spectrum[:, 0], spectrum[:, 1]
+    metadata = prediction_fields(device_id, predicted_value, model_version, acquisition)
+    if spectrum_id:
+        metadata["id"] = spectrum_id
+
+    if binary:
+        body = encode_spectrum(
+            wavelengths, intensities,
+            metadata=metadata,
+            compression=UPLOAD_COMPRESSION
+        )
+        headers = {"Content-Type": SPECTRUM_CONTENT_TYPE}
+    else:
+        payload = {
+            "wavelengths": wavelengths.tolist(),
+            "intensities": intensities.tolist(),
+            **metadata
+        }
+        body = json.dumps(payload)
+        headers = {"Content-Type": "application/json"}
+
+    try:
+        response = (session or requests).post(api_url, data=body, headers=headers, timeout=UPLOAD_TIMEOUT)
+        if response.status_code in (200, 201):
+            logging.info("✅ Spectrum uploaded successfully to API." if response.status_code == 201
+                         else "✅ Spectrum was already uploaded.")
+            spectrum_id = response.json().get("spectrum_id")
+            return spectrum_id
+        else:
+            logging.error(f"❌ Failed to upload spectrum. Status: {response.status_code}, Response: {response.text}")
+    except Exception as e:
+        logging.error(f"⚠️ Exception during spectrum upload: {e}")
+
+    return None
+
+
+def upload_prediction(predicted_value, spectrum_id, device_id, api_url=PREDICTION_UPLOAD_URL, session=None,
+                      model_version=None):
+    """
+    Uploads a predicted SOC value to the Django API.
+
+    Args:
+        predicted_value (float): The predicted SOC value.
+        spectrum_id (str): UUID of the associated spectrum.
+        device_id (str): Identifier of the device used to capture the spectrum.
+        api_url (str): Full URL to the prediction upload endpoint.
+        session (requests.Session): Optional pooled session to post through.
+        model_version (str): Optional identifier of the calibration that produced the value.
+
+    Returns:
+        bool: True if upload successful, False otherwise.
+    """
+    payload = {
+        "device_id": device_id,
+        "predicted_value": float(predicted_value),
+        "spectrum": spectrum_id
+    }
+    if model_version:
+        payload["model_version"] = model_version
+
+    headers = {"Content-Type": "application/json"}
+
+    try:
+        response = (session or requests).post(api_url, json=payload, headers=headers, timeout=UPLOAD_TIMEOUT)
+        if response.status_code == 201:
+            logging.info("✅ Predicted value uploaded to API.")
+            return True
+        else:
+            logging.error(f"❌ Prediction upload failed: {response.status_code} - {response.text}")
+    except Exception as e:
+        logging.error(f"⚠️ Error uploading predicted value: {e}")
+
+    return False
+
+
+def upload_batch(records, api_url=BATCH_UPLOAD_URL, session=None):
+    """
+    Uploads several spectra, each with an optional prediction, in one request.
+
+    Args:
+        records (list[dict]): Items with "spectrum" (N x 2), "device_id" and optionally
+            "predicted_value", "model_version", "acquisition" and "upload_id" (the UUID to
+            store the spectrum under, so a retried batch does not store it twice).
+        api_url (str): Full URL to the batch upload endpoint.
+        session (requests.Session): Optional pooled session to post through.
+
+    Returns:
+        list: One spectrum UUID per record, None where that record was rejected.
+            None instead of a list if the request itself failed.
+    """
+    payload = []
+    for record in records:
+        spectrum = np.asarray(record["spectrum"], dtype=float)
+        payload.append({
+            "wavelengths": spectrum[:, 0].tolist(),
+            "intensities": spectrum[:, 1].tolist(),
+            **prediction_fields(record["device_id"], record.get("predicted_value"), record.get("model_version"),
+                                record.get("acquisition")),
+            **({"id": record["upload_id"]} if record.get("upload_id") else {}),
+        })
+
+    try:
+        response = (session or requests).post(api_url, json=payload, timeout=UPLOAD_TIMEOUT)
+        if response.status_code in (201, 400) and "results" in response.json():
+            spectrum_ids = [None] * len(records)
+            for result in response.json()["results"]:
+                if "spectrum_id" in result:
+                    spectrum_ids[result["index"]] = result["spectrum_id"]
+                else:
+                    logging.error(f"❌ Batch item {result['index']} rejected: {result.get('error')}")
+            logging.info(f"✅ Uploaded {sum(i is not None for i in spectrum_ids)}/{len(records)} spectra in one batch.")
+            return spectrum_ids
+        logging.error(f"❌ Batch upload failed. Status: {response.status_code}, Response: {response.text}")
+    except Exception as e:
+        logging.error(f"⚠️ Exception during batch upload: {e}")
+
+    return None
@@ -0,0 +1,28 @@
+import sys
+from array import array
+
+# Spectra are stored as packed little-endian float64, one blob per axis
+FLOAT_TYPECODE = "d"
+
+
+def pack_floats(values) -> bytes:
+    """
+    Packs a sequence of numbers into a little-endian float64 blob.
+    Raises TypeError if any value is not a number.
+    """
+    packed = array(FLOAT_TYPECODE, values)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_floats(blob) -> list:
+    """
+    Inverse of pack_floats. Accepts bytes or the memoryview psycopg2 returns for bytea.
+    """
+    unpacked = array(FLOAT_TYPECODE)
+    if blob:
+        unpacked.frombytes(bytes(blob))
+        if sys.byteorder != "little":
+            unpacked.byteswap()
+    return unpacked.tolist()
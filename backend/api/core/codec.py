@@ -0,0 +1,119 @@
+"""
+Compact binary encoding for spectrum uploads.
+
+Layout (all integers little-endian):
+
+    magic        4s   b"SPEC"
+    version      u8   1
+    value_size   u8   4 (float32) or 8 (float64)
+    compression  u8   0 = none, 1 = gzip, 2 = zstd
+    (pad)        1
+    num_points   u32
+    meta_length  u32
+    metadata     meta_length bytes of UTF-8 JSON (device_id, ...)
+    payload      num_points wavelengths followed by num_points intensities,
+                 little-endian floats, compressed as a whole if requested
+"""
+import io
+import json
+import struct
+import sys
+import zlib
+from array import array
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, gzip is always available
+    zstandard = None
+
+SPECTRUM_CONTENT_TYPE = "application/x-spectrum"
+
+MAGIC = b"SPEC"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBxII")
+
+COMPRESSION_NONE = 0
+COMPRESSION_GZIP = 1
+COMPRESSION_ZSTD = 2
+
+TYPECODES = {4: "f", 8: "d"}
+
+
+class SpectrumDecodeError(ValueError):
+    pass
+
+
+# Errors a corrupt compressed payload can raise, on top of the stdlib ones handled below
+DECOMPRESSION_ERRORS = (zlib.error,) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+
+def _decompress(payload, compression, max_size):
+    """
+    Decompresses at most max_size + 1 bytes, so a small body cannot inflate without bound;
+    anything longer than max_size is rejected by the caller's length check.
+    """
+    if compression == COMPRESSION_NONE:
+        return payload
+    if compression == COMPRESSION_GZIP:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        data = decompressor.decompress(payload, max_size + 1)
+        if len(data) <= max_size and not decompressor.eof:
+            raise SpectrumDecodeError("Truncated gzip payload")
+        return data
+    if compression == COMPRESSION_ZSTD:
+        if zstandard is None:
+            raise SpectrumDecodeError("zstd-compressed payloads are not supported on this server")
+        reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(payload))
+        chunks = []
+        received = 0
+        while received <= max_size:
+            chunk = reader.read(max_size + 1 - received)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            received += len(chunk)
+        return b"".join(chunks)
+    raise SpectrumDecodeError(f"Unknown compression: {compression}")
+
+
+def decode_spectrum(body: bytes) -> dict:
+    """
+    Decodes a binary spectrum upload into the same shape as the JSON payload:
+    the metadata keys plus 'wavelengths' and 'intensities' as float64 arrays.
+    Raises SpectrumDecodeError if the body is malformed.
+    """
+    if len(body) < HEADER.size:
+        raise SpectrumDecodeError("Truncated header")
+
+    magic, version, value_size, compression, num_points, meta_length = HEADER.unpack_from(body)
+    if magic != MAGIC:
+        raise SpectrumDecodeError("Not a spectrum payload")
+    if version != VERSION:
+        raise SpectrumDecodeError(f"Unsupported version: {version}")
+    if value_size not in TYPECODES:
+        raise SpectrumDecodeError(f"Unsupported value size: {value_size}")
+
+    meta_end = HEADER.size + meta_length
+    expected_size = 2 * num_points * value_size
+    try:
+        metadata = json.loads(body[HEADER.size:meta_end].decode("utf-8")) if meta_length else {}
+        payload = _decompress(body[meta_end:], compression, expected_size)
+    except (UnicodeDecodeError, json.JSONDecodeError, OSError, EOFError) + DECOMPRESSION_ERRORS as e:
+        raise SpectrumDecodeError(f"Corrupt payload: {e}")
+
+    if not isinstance(metadata, dict):
+        raise SpectrumDecodeError("Metadata must be a JSON object")
+    if len(payload) != expected_size:
+        raise SpectrumDecodeError("Payload length does not match num_points")
+
+    values = array(TYPECODES[value_size])
+    values.frombytes(payload)
+    if sys.byteorder != "little":
+        values.byteswap()
+    if value_size == 4:
+        values = array("d", values)
+
+    data = dict(metadata)
+    data["wavelengths"] = values[:num_points]
+    data["intensities"] = values[num_points:]
+    return data
@@ -0,0 +1,38 @@
+import re
+
+# Tags written by make_device_id_tag in aodaq/client/AoDAQClient.py:
+#   {device}_Gain-{gain}_Apo-{apodization}_Avg-{averages}_'{note}'
+DEVICE_TAG_RE = re.compile(
+    r"^(?P<device>.*?)_Gain-(?P<gain>[^_]*)_Apo-(?P<apodization>[^_]*)_Avg-(?P<averages>\d+)_'(?P<note>.*)'$",
+    re.DOTALL,
+)
+MAX_AVERAGES = 2 ** 31 - 1  # PositiveIntegerField range
+
+
+def parse_device_tag(device_id):
+    """
+    Splits a device_id tag into its acquisition settings. Ids that are not tags (uploads from
+    other tools) come back as the device name with every setting None.
+    """
+    match = DEVICE_TAG_RE.match(device_id or "")
+    if match is None:
+        return {"device": device_id or "", "gain": None, "apodization": None, "averages": None, "note": None}
+
+    meta = match.groupdict()
+    meta["averages"] = int(meta["averages"])
+    return meta
+
+
+def acquisition_fields(device_id):
+    """
+    The Spectrum acquisition-settings columns for a device_id tag, with missing settings
+    stored as blank / None.
+    """
+    meta = parse_device_tag(device_id)
+    return {
+        "device": meta["device"][:255],
+        "gain": (meta["gain"] or "")[:32],
+        "apodization": (meta["apodization"] or "")[:32],
+        "averages": meta["averages"] if meta["averages"] is None or meta["averages"] <= MAX_AVERAGES else None,
+        "note": (meta["note"] or "")[:255],
+    }
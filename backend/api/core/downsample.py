@@ -0,0 +1,65 @@
+import numpy as np
+
+# Points kept in the preview stored with each spectrum at upload
+PREVIEW_POINTS = 300
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets: picks `threshold` points that preserve the visual shape
+    of the series. The first and last points are always kept.
+
+    Returns:
+        np.ndarray: Indices of the kept points, in input order.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Bucket i covers [edges[i], edges[i + 1]); the last edge closes on the final point
+    every = (n - 2) / (threshold - 2)
+    edges = np.append((np.arange(threshold - 1) * every).astype(int) + 1, n)
+
+    kept = np.empty(threshold, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2]
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        # Twice the triangle area between the last kept point, each candidate and the next bucket's mean
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def downsample(wavelengths, intensities, points, min_wavelength=None, max_wavelength=None):
+    """
+    Restricts a spectrum to the given wavelength window, if any, then LTTB-downsamples it
+    to at most `points` points.
+    """
+    wavelengths = np.asarray(wavelengths, dtype=float)
+    intensities = np.asarray(intensities, dtype=float)
+    if min_wavelength is not None or max_wavelength is not None:
+        mask = np.ones(len(wavelengths), dtype=bool)
+        if min_wavelength is not None:
+            mask &= wavelengths >= min_wavelength
+        if max_wavelength is not None:
+            mask &= wavelengths <= max_wavelength
+        wavelengths, intensities = wavelengths[mask], intensities[mask]
+
+    kept = lttb_indices(wavelengths, intensities, points)
+    return wavelengths[kept], intensities[kept]
+
+
+def preview_blobs(packed_wavelengths, packed_intensities):
+    """The stored preview for a spectrum, as two packed float64 blobs like the full arrays."""
+    wavelengths, intensities = downsample(
+        np.frombuffer(packed_wavelengths, dtype="<f8"),
+        np.frombuffer(packed_intensities, dtype="<f8"),
+        PREVIEW_POINTS,
+    )
+    return wavelengths.astype("<f8").tobytes(), intensities.astype("<f8").tobytes()
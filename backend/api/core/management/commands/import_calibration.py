@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from core.models import CalibrationModel
+from core.prediction import OUTPUT_SCALE, LinearCalibration
+
+
+class Command(BaseCommand):
+    help = "Registers a calibration_coeffs.csv as a CalibrationModel, optionally making it the active one."
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_path", help="Headerless wavelength,coefficient,constant CSV")
+        parser.add_argument("--scale", type=float, default=OUTPUT_SCALE, help="Factor applied to every prediction")
+        parser.add_argument("--name", default="", help="Human-readable label for the calibration")
+        parser.add_argument("--activate", action="store_true", help="Use it for server-side scoring from now on")
+
+    def handle(self, *args, **options):
+        try:
+            calibration = LinearCalibration.from_csv(options["csv_path"], scale=options["scale"])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read calibration: {e}")
+
+        with transaction.atomic():
+            record = CalibrationModel.objects.filter(version=calibration.version).first()
+            if record is None:
+                record = calibration.to_record(name=options["name"])
+                record.save()
+                self.stdout.write(f"Registered calibration {record.version} ({len(calibration.coefficients)} coefficients).")
+            else:
+                self.stdout.write(f"Calibration {record.version} is already registered.")
+
+            if options["activate"]:
+                CalibrationModel.objects.exclude(pk=record.pk).update(is_active=False)
+                CalibrationModel.objects.filter(pk=record.pk).update(is_active=True)
+                self.stdout.write(f"Calibration {record.version} is now active.")
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-18 08:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_alter_prediction_spectrum'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='spectrum',
+            index=models.Index(fields=['-timestamp', '-id'], name='spectrum_ts_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='spectrum',
+            index=models.Index(fields=['device_id', '-timestamp', '-id'], name='spectrum_device_ts_id_idx'),
+        ),
+    ]
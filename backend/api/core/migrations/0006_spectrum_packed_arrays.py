@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_spectrum_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spectrum',
+            name='intensities',
+            field=models.BinaryField(default=bytes),
+        ),
+        migrations.AddField(
+            model_name='spectrum',
+            name='num_points',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='spectrum',
+            name='wavelengths',
+            field=models.BinaryField(default=bytes),
+        ),
+    ]
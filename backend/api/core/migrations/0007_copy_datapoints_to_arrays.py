@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-18 09:00
+
+from django.db import migrations
+
+from core.arrays import pack_floats
+
+
+def copy_datapoints_to_arrays(apps, schema_editor):
+    Spectrum = apps.get_model('core', 'Spectrum')
+    SpectrumDataPoint = apps.get_model('core', 'SpectrumDataPoint')
+
+    for spectrum in Spectrum.objects.filter(num_points=0).only('id').iterator():
+        # Points were bulk-inserted in upload order, so the row id preserves it
+        points = list(
+            SpectrumDataPoint.objects.filter(spectrum_id=spectrum.id)
+            .order_by('id')
+            .values_list('wavelength', 'intensity')
+        )
+        if not points:
+            continue
+
+        wavelengths, intensities = zip(*points)
+        Spectrum.objects.filter(id=spectrum.id).update(
+            wavelengths=pack_floats(wavelengths),
+            intensities=pack_floats(intensities),
+            num_points=len(points),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_spectrum_packed_arrays'),
+    ]
+
+    operations = [
+        # The legacy rows are left in place, so reversing has nothing to undo
+        migrations.RunPython(copy_datapoints_to_arrays, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 09:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_prediction_model_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalibrationModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=64, unique=True)),
+                ('name', models.CharField(blank=True, default='', max_length=255)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('wavelengths', models.BinaryField()),
+                ('coefficients', models.BinaryField()),
+                ('constant', models.FloatField()),
+                ('scale', models.FloatField(default=0.1)),
+                ('is_active', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='calibration',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='predictions', to='core.calibrationmodel'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 09:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_calibration_registry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spectrum',
+            name='preview_intensities',
+            field=models.BinaryField(default=bytes),
+        ),
+        migrations.AddField(
+            model_name='spectrum',
+            name='preview_wavelengths',
+            field=models.BinaryField(default=bytes),
+        ),
+    ]
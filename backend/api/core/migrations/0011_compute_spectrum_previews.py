@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 09:15
+
+from django.db import migrations
+
+from core.downsample import preview_blobs
+
+
+def compute_spectrum_previews(apps, schema_editor):
+    Spectrum = apps.get_model('core', 'Spectrum')
+
+    spectra = Spectrum.objects.filter(num_points__gt=0).only('id', 'wavelengths', 'intensities')
+    for spectrum in spectra.iterator(chunk_size=200):
+        preview_wavelengths, preview_intensities = preview_blobs(spectrum.wavelengths, spectrum.intensities)
+        Spectrum.objects.filter(id=spectrum.id).update(
+            preview_wavelengths=preview_wavelengths,
+            preview_intensities=preview_intensities,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_spectrum_previews'),
+    ]
+
+    operations = [
+        migrations.RunPython(compute_spectrum_previews, migrations.RunPython.noop),
+    ]
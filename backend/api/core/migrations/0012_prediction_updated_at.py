@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 09:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_compute_spectrum_previews'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prediction',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2 on 2026-10-18 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_prediction_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spectrum',
+            name='apodization',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='spectrum',
+            name='averages',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='spectrum',
+            name='device',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='spectrum',
+            name='gain',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='spectrum',
+            name='note',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='spectrum',
+            name='saturation',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='spectrum',
+            index=models.Index(fields=['device', '-timestamp', '-id'], name='spectrum_dev_ts_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='spectrum',
+            index=models.Index(fields=['gain', 'apodization', 'averages', '-timestamp', '-id'], name='spectrum_settings_ts_id_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-18 09:18
+
+import re
+
+from django.db import migrations
+
+# Copied from core.device_meta as it was when this migration was written, so later changes
+# to the parser cannot change what this migration does.
+DEVICE_TAG_RE = re.compile(
+    r"^(?P<device>.*?)_Gain-(?P<gain>[^_]*)_Apo-(?P<apodization>[^_]*)_Avg-(?P<averages>\d+)_'(?P<note>.*)'$",
+    re.DOTALL,
+)
+MAX_AVERAGES = 2 ** 31 - 1
+
+
+def acquisition_fields(device_id):
+    match = DEVICE_TAG_RE.match(device_id or "")
+    if match is None:
+        return {"device": (device_id or "")[:255], "gain": "", "apodization": "", "averages": None, "note": ""}
+
+    meta = match.groupdict()
+    averages = int(meta["averages"])
+    return {
+        "device": meta["device"][:255],
+        "gain": meta["gain"][:32],
+        "apodization": meta["apodization"][:32],
+        "averages": averages if averages <= MAX_AVERAGES else None,
+        "note": meta["note"][:255],
+    }
+
+
+def backfill_acquisition_settings(apps, schema_editor):
+    Spectrum = apps.get_model('core', 'Spectrum')
+
+    # Tags repeat for every scan taken with the same settings, so update per distinct tag
+    device_ids = Spectrum.objects.order_by().values_list('device_id', flat=True).distinct()
+    for device_id in list(device_ids):
+        Spectrum.objects.filter(device_id=device_id).update(**acquisition_fields(device_id))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_spectrum_acquisition_settings'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_acquisition_settings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 09:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_backfill_acquisition_settings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prediction',
+            name='source',
+            field=models.CharField(choices=[('device', 'Device'), ('server', 'Server')], default='device', max_length=16),
+        ),
+    ]
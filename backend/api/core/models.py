@@ -5,14 +5,66 @@ class Spectrum(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     timestamp = models.DateTimeField(auto_now_add=True)
     device_id = models.CharField(max_length=255)
+    # Acquisition settings, sent by the client or parsed from device_id tags (core.device_meta)
+    device = models.CharField(max_length=255, blank=True, default='')
+    gain = models.CharField(max_length=32, blank=True, default='')
+    apodization = models.CharField(max_length=32, blank=True, default='')
+    averages = models.PositiveIntegerField(null=True, blank=True)
+    note = models.CharField(max_length=255, blank=True, default='')
+    saturation = models.FloatField(null=True, blank=True)
+    # Packed float64 arrays, see core.arrays
+    wavelengths = models.BinaryField(default=bytes)
+    intensities = models.BinaryField(default=bytes)
+    num_points = models.PositiveIntegerField(default=0)
+    # LTTB-downsampled copy for plotting, see core.downsample
+    preview_wavelengths = models.BinaryField(default=bytes)
+    preview_intensities = models.BinaryField(default=bytes)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination walks (timestamp, id) newest-first
+            models.Index(fields=['-timestamp', '-id'], name='spectrum_ts_id_idx'),
+            models.Index(fields=['device_id', '-timestamp', '-id'], name='spectrum_device_ts_id_idx'),
+            models.Index(fields=['device', '-timestamp', '-id'], name='spectrum_dev_ts_id_idx'),
+            models.Index(fields=['gain', 'apodization', 'averages', '-timestamp', '-id'], name='spectrum_settings_ts_id_idx'),
+        ]
+
+# Legacy one-row-per-point storage. New uploads are stored as arrays on Spectrum;
+# existing rows were copied across by migration 0007 and are no longer read.
 class SpectrumDataPoint(models.Model):
     spectrum = models.ForeignKey(Spectrum, related_name='data', on_delete=models.CASCADE)
     wavelength = models.FloatField()
     intensity = models.FloatField()
     
+class CalibrationModel(models.Model):
+    """
+    A registered linear calibration (see core.prediction). Arrays are packed like Spectrum's.
+    """
+    version = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, blank=True, default='')
+    created = models.DateTimeField(auto_now_add=True)
+    wavelengths = models.BinaryField()
+    coefficients = models.BinaryField()
+    constant = models.FloatField()
+    scale = models.FloatField(default=0.1)
+    # The calibration used for server-side scoring; at most one is active
+    is_active = models.BooleanField(default=False)
+
 class Prediction(models.Model):
+    SOURCE_DEVICE = 'device'
+    SOURCE_SERVER = 'server'
+    SOURCE_CHOICES = [(SOURCE_DEVICE, 'Device'), (SOURCE_SERVER, 'Server')]
+
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Changes when the value is rescored; feeds the listing's ETag / Last-Modified
+    updated_at = models.DateTimeField(auto_now=True)
     device_id = models.CharField(max_length=255)
     predicted_value = models.FloatField()
-    spectrum = models.OneToOneField(Spectrum, on_delete=models.CASCADE, related_name='prediction')
\ No newline at end of file
+    # Identifies the calibration that produced the value, empty if unknown
+    model_version = models.CharField(max_length=64, blank=True, default='')
+    # Set when model_version matches a registered calibration
+    calibration = models.ForeignKey(CalibrationModel, null=True, blank=True, on_delete=models.SET_NULL, related_name='predictions')
+    spectrum = models.OneToOneField(Spectrum, on_delete=models.CASCADE, related_name='prediction')
+    # Who computed the value: the device that uploaded it, or the server's calibration
+    # (scored on upload or rescored). Only server values may be replaced by a device upload.
+    source = models.CharField(max_length=16, choices=SOURCE_CHOICES, default=SOURCE_DEVICE)
\ No newline at end of file
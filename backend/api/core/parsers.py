@@ -0,0 +1,16 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from .codec import SPECTRUM_CONTENT_TYPE, SpectrumDecodeError, decode_spectrum
+
+
+class SpectrumBinaryParser(BaseParser):
+    """
+    Parses the compact binary spectrum format described in core.codec.
+    """
+    media_type = SPECTRUM_CONTENT_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return decode_spectrum(stream.read())
+        except SpectrumDecodeError as e:
+            raise ParseError(f"Binary spectrum parse error - {e}")
@@ -0,0 +1,223 @@
+import csv
+import math
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import cached_property
+import numpy as np
+from .arrays import pack_floats
+from .models import CalibrationModel
+
+# Server-side counterpart of aodaq/client/calibration.py, using numpy only so the Lambda
+# package stays small. Predictions and model versions match the client's for the same CSV;
+# testing/check_prediction_parity.py checks that they still do after changing either copy.
+
+OUTPUT_SCALE = 0.1
+INTERP_CACHE_SIZE = 32  # Distinct source wavelength grids remembered per calibration
+
+# version -> LinearCalibration; lives as long as the Lambda container. Registered
+# calibrations are immutable, so entries never go stale.
+_CALIBRATION_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def read_calibration_csv(path):
+    """
+    Reads a headerless wavelength,coefficient,constant CSV. Rows without a coefficient are
+    skipped and the first non-empty constant is used.
+    """
+    wavelengths, coefficients, constant = [], [], None
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            row = [cell.strip() for cell in row] + ["", "", ""]
+            if constant is None and row[2]:
+                constant = float(row[2])
+            if row[0] and row[1] and not math.isnan(float(row[1])):
+                wavelengths.append(float(row[0]))
+                coefficients.append(float(row[1]))
+
+    if not coefficients or constant is None:
+        raise ValueError(f"No calibration found in {path}")
+    return np.array(wavelengths), np.array(coefficients), constant
+
+
+def to_array(blob):
+    """A packed float64 blob (see core.arrays) as a read-only numpy array, without copying."""
+    return np.frombuffer(blob, dtype="<f8") if blob else np.empty(0)
+
+
+def snv_rows(x):
+    """
+    Row-wise standard normal variate; rows with zero spread become zeros.
+    """
+    x = np.nan_to_num(np.asarray(x, dtype=float), nan=0.0, posinf=0.0, neginf=0.0)
+    mu = x.mean(axis=1, keepdims=True)
+    sigma = x.std(axis=1, keepdims=True)
+    flat = (sigma == 0)
+    out = (x - mu) / np.where(flat, 1.0, sigma)
+    out[np.broadcast_to(flat, out.shape)] = 0.0
+    return out
+
+
+def linear_interp_weights(source_wavelengths, target_wavelengths):
+    """
+    Precomputes linear interpolation from a source grid onto a target grid, extrapolating
+    along the first/last segment beyond the ends.
+
+    Returns:
+        (order, lo, frac): sort order of the source grid, left neighbour of each target point
+        in the sorted grid, and the fractional distance towards the right neighbour.
+    """
+    source = np.asarray(source_wavelengths, dtype=float)
+    target = np.asarray(target_wavelengths, dtype=float)
+    order = np.argsort(source, kind="stable")
+    xs = source[order]
+
+    lo = np.clip(np.searchsorted(xs, target, side="right") - 1, 0, len(xs) - 2)
+    frac = (target - xs[lo]) / (xs[lo + 1] - xs[lo])
+    return order, lo, frac
+
+
+class LinearCalibration:
+    """
+    A linear calibration: interpolate onto the calibration grid, SNV, dot with coefficients.
+    """
+
+    def __init__(self, wavelengths, coefficients, constant, scale=OUTPUT_SCALE, model_id=None):
+        self.wavelengths = np.ascontiguousarray(wavelengths, dtype=float)
+        self.coefficients = np.ascontiguousarray(coefficients, dtype=float)
+        self.constant = float(constant)
+        self.scale = float(scale)
+        # Primary key of the CalibrationModel row this was loaded from, if any
+        self.model_id = model_id
+        # Source grid bytes -> interpolation weights onto self.wavelengths, LRU order
+        self._weights_cache = OrderedDict()
+        self._weights_lock = threading.Lock()
+
+    @classmethod
+    def from_csv(cls, path, scale=OUTPUT_SCALE):
+        return cls(*read_calibration_csv(path), scale=scale)
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(to_array(record.wavelengths), to_array(record.coefficients), record.constant,
+                   scale=record.scale, model_id=record.pk)
+
+    def to_record(self, name=""):
+        """An unsaved CalibrationModel holding this calibration."""
+        return CalibrationModel(
+            version=self.version,
+            name=name,
+            wavelengths=pack_floats(self.wavelengths.tolist()),
+            coefficients=pack_floats(self.coefficients.tolist()),
+            constant=self.constant,
+            scale=self.scale,
+        )
+
+    @cached_property
+    def version(self):
+        """Short content hash identifying this calibration, as computed by the client."""
+        digest = hashlib.blake2b(digest_size=8)
+        for part in (self.wavelengths, self.coefficients, np.array([self.constant, self.scale])):
+            digest.update(np.ascontiguousarray(part, dtype="<f8").tobytes())
+        return digest.hexdigest()
+
+    def weights_for(self, wavelengths):
+        key = np.ascontiguousarray(wavelengths, dtype=float).tobytes()
+        with self._weights_lock:
+            weights = self._weights_cache.get(key)
+            if weights is not None:
+                self._weights_cache.move_to_end(key)
+                return weights
+
+        weights = linear_interp_weights(wavelengths, self.wavelengths)
+        with self._weights_lock:
+            self._weights_cache[key] = weights
+            while len(self._weights_cache) > INTERP_CACHE_SIZE:
+                self._weights_cache.popitem(last=False)
+        return weights
+
+    def predict_matrix(self, wavelengths, intensities):
+        """
+        Predicts N spectra sharing one wavelength axis, given as an (N x M) intensity matrix.
+        """
+        order, lo, frac = self.weights_for(wavelengths)
+        y = np.atleast_2d(np.asarray(intensities, dtype=float))[:, order]
+        aligned = y[:, lo] * (1.0 - frac) + y[:, lo + 1] * frac
+        return (snv_rows(aligned) @ self.coefficients + self.constant) * self.scale
+
+    def predict_batch(self, spectra):
+        """
+        Predicts a list of (wavelengths, intensities) pairs. Spectra sharing an identical
+        wavelength axis are stacked and scored together with predict_matrix.
+
+        Returns:
+            np.ndarray: One predicted value per input spectrum, in input order.
+        """
+        groups = {}
+        for idx, (wavelengths, intensities) in enumerate(spectra):
+            wavelengths = np.asarray(wavelengths, dtype=float)
+            groups.setdefault(wavelengths.tobytes(), (wavelengths, []))[1].append((idx, intensities))
+
+        predictions = np.empty(len(spectra))
+        for wavelengths, members in groups.values():
+            indices = [idx for idx, _ in members]
+            predictions[indices] = self.predict_matrix(wavelengths, np.stack([y for _, y in members]))
+        return predictions
+
+    def predict(self, wavelengths, intensities):
+        return float(self.predict_matrix(wavelengths, intensities)[0])
+
+
+def calibration_for(version):
+    """
+    Returns the registered calibration with the given version, or None if there is none.
+    The arrays are read from the database only the first time a version is used.
+    """
+    with _CACHE_LOCK:
+        calibration = _CALIBRATION_CACHE.get(version)
+    if calibration is not None:
+        return calibration
+
+    record = CalibrationModel.objects.filter(version=version).first()
+    if record is None:
+        return None
+    calibration = LinearCalibration.from_record(record)
+    with _CACHE_LOCK:
+        _CALIBRATION_CACHE[version] = calibration
+    return calibration
+
+
+def active_calibration():
+    """
+    The active registered calibration, or None if none is active. Costs one small query
+    for the active version; the model itself comes from the cache.
+    """
+    version = CalibrationModel.objects.filter(is_active=True).order_by('-created').values_list('version', flat=True).first()
+    return calibration_for(version) if version else None
+
+
+def registered_versions(versions):
+    """Maps each of the given version strings that is registered to its CalibrationModel id."""
+    versions = {version for version in versions if version}
+    if not versions:
+        return {}
+    return dict(CalibrationModel.objects.filter(version__in=versions).values_list('version', 'id'))
+
+
+def score_spectra(calibration, spectra):
+    """
+    Predicts a list of Spectrum instances straight from their packed arrays.
+
+    Returns:
+        list[float]: One value per spectrum; None for spectra with fewer than two points.
+    """
+    scores = [None] * len(spectra)
+    scorable = [i for i, spectrum in enumerate(spectra) if spectrum.num_points >= 2]
+    if scorable:
+        predictions = calibration.predict_batch(
+            [(to_array(spectra[i].wavelengths), to_array(spectra[i].intensities)) for i in scorable]
+        )
+        for i, value in zip(scorable, predictions):
+            scores[i] = float(value) if math.isfinite(value) else None
+    return scores
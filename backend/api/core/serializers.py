@@ -1,5 +1,25 @@
 from rest_framework import serializers
-from .models import Spectrum, SpectrumDataPoint, Prediction
+from .arrays import pack_floats, unpack_floats
+from .models import Spectrum, Prediction
+
+# Acquisition settings shown alongside device_id
+SETTINGS_FIELDS = ['device', 'gain', 'apodization', 'averages', 'note', 'saturation']
+
+
+class PackedFloatArrayField(serializers.Field):
+    """
+    Exposes a packed float64 blob (see core.arrays) as a plain list of floats.
+    """
+
+    def to_representation(self, value):
+        return unpack_floats(value)
+
+    def to_internal_value(self, data):
+        try:
+            return pack_floats(data)
+        except TypeError:
+            raise serializers.ValidationError("Expected a list of numbers.")
+
 
 class SpectrumSerializer(serializers.ModelSerializer):
     class Meta:
@@ -7,22 +27,35 @@ class SpectrumSerializer(serializers.ModelSerializer):
         fields = ['id', 'timestamp', 'device_id']
 
 
-class SpectrumDataPointSerializer(serializers.ModelSerializer):
+class SpectrumSummarySerializer(serializers.ModelSerializer):
+    # Read from a .values() row annotated with the prediction, not a model instance
+    predicted_value = serializers.FloatField(read_only=True, allow_null=True)
+
     class Meta:
-        model = SpectrumDataPoint
-        fields = ['wavelength', 'intensity']
+        model = Spectrum
+        fields = ['id', 'timestamp', 'device_id', *SETTINGS_FIELDS, 'predicted_value']
 
 
 class SpectrumDetailSerializer(serializers.ModelSerializer):
-    data = SpectrumDataPointSerializer(many=True, read_only=True)
+    wavelengths = PackedFloatArrayField(read_only=True)
+    intensities = PackedFloatArrayField(read_only=True)
     predicted_value = serializers.FloatField(source='prediction.predicted_value', read_only=True)
 
     class Meta:
         model = Spectrum
-        fields = ['id', 'timestamp', 'device_id', 'data', 'predicted_value']
+        fields = ['id', 'timestamp', 'device_id', *SETTINGS_FIELDS, 'wavelengths', 'intensities', 'predicted_value']
         
 
+class SpectrumPreviewSerializer(serializers.ModelSerializer):
+    # Point data is added by the view, downsampled to the requested resolution
+    predicted_value = serializers.FloatField(source='prediction.predicted_value', read_only=True)
+
+    class Meta:
+        model = Spectrum
+        fields = ['id', 'timestamp', 'device_id', *SETTINGS_FIELDS, 'num_points', 'predicted_value']
+
+
 class PredictionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Prediction
-        fields = ['device_id', 'predicted_value', 'spectrum']
\ No newline at end of file
+        fields = ['device_id', 'predicted_value', 'model_version', 'spectrum']
\ No newline at end of file
@@ -135,3 +135,6 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Score spectra uploaded without a predicted_value with the active CalibrationModel, if any
+PREDICT_ON_UPLOAD = os.environ.get("PREDICT_ON_UPLOAD", "1") == "1"
@@ -0,0 +1,78 @@
+import numpy as np
+from .prediction import to_array
+
+
+class SpectrumAccumulator:
+    """
+    Running per-wavelength mean / std / min / max over the spectra of one group (Welford),
+    plus their predicted values. Spectra are accumulated one at a time, so the group never
+    has to be held in memory as a matrix.
+
+    The first spectrum fixes the wavelength grid; spectra on a different grid are linearly
+    interpolated onto it.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.resampled = 0
+        self.wavelengths = None
+        self._mean = None
+        self._m2 = None
+        self._min = None
+        self._max = None
+        self.predictions = []
+
+    def add(self, wavelengths, intensities, predicted_value=None):
+        wavelengths = to_array(wavelengths)
+        intensities = to_array(intensities)
+        if len(wavelengths) < 2 or len(wavelengths) != len(intensities):
+            return
+
+        if self.wavelengths is None:
+            self.wavelengths = wavelengths.copy()
+            self._mean = np.zeros(len(wavelengths))
+            self._m2 = np.zeros(len(wavelengths))
+            self._min = np.full(len(wavelengths), np.inf)
+            self._max = np.full(len(wavelengths), -np.inf)
+        elif len(wavelengths) != len(self.wavelengths) or not np.array_equal(wavelengths, self.wavelengths):
+            order = np.argsort(wavelengths, kind="stable")
+            intensities = np.interp(self.wavelengths, wavelengths[order], intensities[order])
+            self.resampled += 1
+
+        self.count += 1
+        delta = intensities - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (intensities - self._mean)
+        np.minimum(self._min, intensities, out=self._min)
+        np.maximum(self._max, intensities, out=self._max)
+        if predicted_value is not None:
+            self.predictions.append(predicted_value)
+
+    def summary(self) -> dict:
+        """Aggregated arrays (population std) and prediction statistics, JSON-ready."""
+        if self.count == 0:
+            return {"count": 0, "resampled": 0, "wavelengths": [], "mean": [], "std": [], "min": [], "max": [],
+                    "prediction": prediction_summary(self.predictions)}
+        return {
+            "count": self.count,
+            "resampled": self.resampled,
+            "wavelengths": self.wavelengths.tolist(),
+            "mean": self._mean.tolist(),
+            "std": np.sqrt(self._m2 / self.count).tolist(),
+            "min": self._min.tolist(),
+            "max": self._max.tolist(),
+            "prediction": prediction_summary(self.predictions),
+        }
+
+
+def prediction_summary(values) -> dict:
+    if not values:
+        return {"count": 0, "mean": None, "std": None, "min": None, "max": None}
+    values = np.asarray(values, dtype=float)
+    return {
+        "count": len(values),
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+        "min": float(values.min()),
+        "max": float(values.max()),
+    }
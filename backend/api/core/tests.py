@@ -0,0 +1,128 @@
+import json
+import uuid
+import numpy as np
+from django.test import TestCase, override_settings
+from .models import Prediction, Spectrum
+from .prediction import LinearCalibration
+
+
+def make_calibration():
+    rng = np.random.default_rng(0)
+    calibration = LinearCalibration(np.linspace(1300.0, 2500.0, 50), rng.normal(size=50), 3.2)
+    record = calibration.to_record(name="test")
+    record.is_active = True
+    record.save()
+    return calibration
+
+
+class UploadPredictionTests(TestCase):
+    def setUp(self):
+        self.calibration = make_calibration()
+
+    def post(self, url, payload):
+        return self.client.post(url, json.dumps(payload), content_type="application/json")
+
+    def upload_spectrum(self, **fields):
+        grid = np.linspace(1200.0, 2600.0, 100)
+        response = self.post("/upload-spectrum/", {
+            "wavelengths": grid.tolist(),
+            "intensities": np.random.default_rng(1).random(100).tolist(),
+            "device_id": "pi-01",
+            **fields,
+        })
+        self.assertEqual(response.status_code, 201)
+        return response.json()["spectrum_id"]
+
+    def upload_prediction(self, spectrum_id, value):
+        return self.post("/upload-prediction/", {
+            "spectrum": spectrum_id,
+            "device_id": "pi-01",
+            "predicted_value": value,
+            "model_version": self.calibration.version,
+        })
+
+    @override_settings(PREDICT_ON_UPLOAD=True)
+    def test_device_value_replaces_server_scored_prediction(self):
+        spectrum_id = self.upload_spectrum()
+        prediction = Prediction.objects.get(spectrum_id=spectrum_id)
+        self.assertEqual(prediction.source, Prediction.SOURCE_SERVER)
+
+        response = self.upload_prediction(spectrum_id, 4.0)
+        self.assertEqual(response.status_code, 201)
+        prediction.refresh_from_db()
+        self.assertEqual(prediction.predicted_value, 4.0)
+        self.assertEqual(prediction.source, Prediction.SOURCE_DEVICE)
+        self.assertEqual(Prediction.objects.filter(spectrum_id=spectrum_id).count(), 1)
+
+    @override_settings(PREDICT_ON_UPLOAD=False)
+    def test_second_device_value_is_rejected(self):
+        spectrum_id = self.upload_spectrum()
+        self.assertEqual(self.upload_prediction(spectrum_id, 4.0).status_code, 201)
+
+        # The version is registered, so the stored row looks like a server score except for its source
+        response = self.upload_prediction(spectrum_id, 9.9)
+        self.assertEqual(response.status_code, 400)
+        prediction = Prediction.objects.get(spectrum_id=spectrum_id)
+        self.assertEqual(prediction.predicted_value, 4.0)
+        self.assertEqual(prediction.source, Prediction.SOURCE_DEVICE)
+        self.assertIsNotNone(prediction.calibration_id)
+
+    @override_settings(PREDICT_ON_UPLOAD=True)
+    def test_device_value_sent_with_spectrum_is_not_replaced(self):
+        spectrum_id = self.upload_spectrum(predicted_value=4.0, model_version=self.calibration.version)
+        self.assertEqual(self.upload_prediction(spectrum_id, 9.9).status_code, 400)
+        self.assertEqual(Prediction.objects.get(spectrum_id=spectrum_id).predicted_value, 4.0)
+        self.assertEqual(Spectrum.objects.count(), 1)
+
+
+class IdempotentUploadTests(TestCase):
+    def post(self, url, payload):
+        return self.client.post(url, json.dumps(payload), content_type="application/json")
+
+    def payload(self, spectrum_id):
+        return {"id": spectrum_id, "wavelengths": [1.0, 2.0, 3.0], "intensities": [4.0, 5.0, 6.0],
+                "device_id": "pi-01", "predicted_value": 1.5}
+
+    def test_repeated_spectrum_upload_returns_the_stored_id(self):
+        spectrum_id = str(uuid.uuid4())
+        first = self.post("/upload-spectrum/", self.payload(spectrum_id))
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(first.json()["spectrum_id"], spectrum_id)
+
+        second = self.post("/upload-spectrum/", self.payload(spectrum_id))
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()["spectrum_id"], spectrum_id)
+        self.assertEqual(Spectrum.objects.count(), 1)
+        self.assertEqual(Prediction.objects.count(), 1)
+
+    def test_repeated_batch_skips_stored_ids(self):
+        ids = [str(uuid.uuid4()) for _ in range(2)]
+        self.assertEqual(self.post("/upload-spectra/", [self.payload(ids[0])]).status_code, 201)
+
+        response = self.post("/upload-spectra/", [self.payload(i) for i in ids] + [self.payload(ids[1])])
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body["created"], body["duplicates"]), (1, 2))
+        self.assertEqual([result["spectrum_id"] for result in body["results"]], ids + [ids[1]])
+        self.assertEqual(Spectrum.objects.count(), 2)
+        self.assertEqual(Prediction.objects.count(), 2)
+
+    def test_malformed_id_is_rejected(self):
+        self.assertEqual(self.post("/upload-spectrum/", self.payload("not-a-uuid")).status_code, 400)
+        self.assertEqual(self.post("/upload-spectrum/", self.payload(5)).status_code, 400)
+
+
+class SpectraStatsTests(TestCase):
+    def test_aggregation_is_capped(self):
+        for i in range(5):
+            self.client.post("/upload-spectrum/", json.dumps({
+                "wavelengths": [1.0, 2.0, 3.0], "intensities": [float(i)] * 3, "device_id": "pi-01",
+            }), content_type="application/json")
+
+        body = self.client.get("/spectra/stats/", {"limit": 3}).json()
+        self.assertEqual((body["count"], body["truncated"]), (3, True))
+        self.assertEqual(body["groups"][0]["count"], 3)
+
+        body = self.client.get("/spectra/stats/", {"limit": 5}).json()
+        self.assertEqual((body["count"], body["truncated"]), (5, False))
+        self.assertEqual(self.client.get("/spectra/stats/", {"limit": "x"}).status_code, 400)
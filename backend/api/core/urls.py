@@ -16,7 +16,7 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path
-from .views import upload_spectrum, list_spectra, upload_prediction
+from .views import upload_spectrum, upload_spectra_batch, list_spectra, spectrum_detail, spectra_stats, rescore_spectra, upload_prediction
 from django.http import HttpResponse
 
 def home(request):
@@ -27,5 +27,9 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('upload-prediction/', upload_prediction),
     path("spectra/", list_spectra, name="list-spectra"),
+    path("spectra/<uuid:spectrum_id>/", spectrum_detail, name="spectrum-detail"),
+    path("spectra/rescore/", rescore_spectra, name="rescore-spectra"),
+    path("spectra/stats/", spectra_stats, name="spectra-stats"),
     path("upload-spectrum/", upload_spectrum, name="upload-spectrum"),
+    path("upload-spectra/", upload_spectra_batch, name="upload-spectra"),
 ]
\ No newline at end of file
@@ -1,49 +1,724 @@
-from rest_framework.decorators import api_view
+import base64
+import binascii
+import hashlib
+import math
+import uuid
+from array import array
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import condition
+from rest_framework.decorators import api_view, parser_classes
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Spectrum, SpectrumDataPoint, Prediction
-from .serializers import SpectrumDetailSerializer, PredictionSerializer
+from .arrays import pack_floats
+from .device_meta import MAX_AVERAGES, acquisition_fields
+from .downsample import PREVIEW_POINTS, downsample, preview_blobs
+from .models import Spectrum, Prediction
+from .parsers import SpectrumBinaryParser
+from .prediction import active_calibration, registered_versions, score_spectra, to_array
+from .stats import SpectrumAccumulator
+from .serializers import SETTINGS_FIELDS, SpectrumDetailSerializer, SpectrumPreviewSerializer, SpectrumSummarySerializer, PredictionSerializer
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_BATCH_SIZE = 500
+RESCORE_CHUNK_SIZE = 500
+# Spectra rescored per rescore call, so each request stays well inside the API Gateway timeout
+DEFAULT_RESCORE_LIMIT = 1000
+MAX_RESCORE_LIMIT = 2000
+MAX_PREVIEW_POINTS = 10000
+STATS_CHUNK_SIZE = 200
+DEFAULT_STATS_LIMIT = 1000
+MAX_STATS_LIMIT = 2000  # spectra aggregated per request, so one call stays inside the API Gateway timeout
+# Point data never changes once uploaded. A rescored predicted_value may be served stale
+# for this long; the listing, which is always revalidated, carries the current one.
+SPECTRUM_DETAIL_MAX_AGE = 24 * 60 * 60
 
+
+def encode_cursor(timestamp, spectrum_id):
+    raw = f"{timestamp.isoformat()}|{spectrum_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Turns an opaque cursor back into the (timestamp, id) of the last row seen.
+    Raises ValueError if the cursor was not produced by encode_cursor.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp_str, id_str = raw.split("|", 1)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+    timestamp = parse_datetime(timestamp_str)
+    if timestamp is None:
+        raise ValueError("Invalid cursor")
+    return timestamp, uuid.UUID(id_str)
+
+
+def filter_spectra(queryset, params):
+    """
+    Applies the query parameters shared by the listing endpoints: device_id, the acquisition
+    settings (device, gain, apodization, averages, note, min_/max_saturation), since and until.
+    Raises ValueError on a malformed value.
+    """
+    device_id = params.get("device_id")
+    if device_id:
+        queryset = queryset.filter(device_id=device_id)
+
+    # Exact matches, served by the device and settings indexes
+    for field in ("device", "gain", "apodization", "note"):
+        value = params.get(field)
+        if value:
+            queryset = queryset.filter(**{field: value})
+    averages = params.get("averages")
+    if averages:
+        try:
+            queryset = queryset.filter(averages=int(averages))
+        except ValueError:
+            raise ValueError(f"Invalid 'averages': {averages}")
+
+    for param, lookup in (("min_saturation", "saturation__gte"), ("max_saturation", "saturation__lte")):
+        value = params.get(param)
+        if value:
+            try:
+                queryset = queryset.filter(**{lookup: float(value)})
+            except ValueError:
+                raise ValueError(f"Invalid '{param}': {value}")
+
+    for param, lookup in (("since", "timestamp__gte"), ("until", "timestamp__lt")):
+        value = params.get(param)
+        if value:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                raise ValueError(f"Invalid '{param}' timestamp: {value}")
+            queryset = queryset.filter(**{lookup: parsed})
+
+    return queryset
+
+
+def list_spectra_summary(request):
+    """
+    Keyset-paginated listing of spectrum metadata only, newest first.
+    The cursor encodes the (timestamp, id) of the last row returned.
+    """
+    try:
+        limit = int(request.query_params.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return Response({"error": "'limit' must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    try:
+        spectra = filter_spectra(Spectrum.objects.all(), request.query_params)
+
+        cursor = request.query_params.get("cursor")
+        if cursor:
+            last_timestamp, last_id = decode_cursor(cursor)
+            spectra = spectra.filter(
+                Q(timestamp__lt=last_timestamp) | Q(timestamp=last_timestamp, id__lt=last_id)
+            )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Fetch one extra row to know whether another page exists
+    rows = list(
+        spectra.order_by('-timestamp', '-id')
+        .annotate(predicted_value=F('prediction__predicted_value'))
+        .values('id', 'timestamp', 'device_id', *SETTINGS_FIELDS, 'predicted_value')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+
+    return Response({
+        "results": SpectrumSummarySerializer(rows, many=True).data,
+        "next_cursor": next_cursor,
+    })
+
+
+def query_fingerprint(request, *parts):
+    """Hashes validator state together with the query string, which selects a different representation."""
+    raw = "|".join([*map(str, parts), request.META.get("QUERY_STRING", "")])
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+def listing_state(request):
+    """
+    Returns (last modified, ETag) for the listings, computed once per request. Spectra are
+    only ever added and predictions carry updated_at, so the newest timestamps together
+    with the row counts (which catch deletions) change whenever any listing would.
+    """
+    state = getattr(request, "_listing_state", None)
+    if state is None:
+        spectra = Spectrum.objects.aggregate(latest=Max('timestamp'), count=Count('id'))
+        predictions = Prediction.objects.aggregate(latest=Max('updated_at'), count=Count('id'))
+        last_modified = max(filter(None, (spectra['latest'], predictions['latest'])), default=None)
+        etag = query_fingerprint(request, spectra['latest'], spectra['count'], predictions['latest'], predictions['count'])
+        state = request._listing_state = (last_modified, etag)
+    return state
+
+
+def listing_last_modified(request):
+    return listing_state(request)[0]
+
+
+def listing_etag(request):
+    return listing_state(request)[1]
+
+
+@condition(etag_func=listing_etag, last_modified_func=listing_last_modified)
 @api_view(['GET'])
 def list_spectra(request):
-    spectra = Spectrum.objects.select_related('prediction').prefetch_related('data').order_by('-timestamp')
-    serializer = SpectrumDetailSerializer(spectra, many=True)
-    return Response(serializer.data)
+    if request.query_params.get("view") == "summary":
+        response = list_spectra_summary(request)
+    else:
+        spectra = Spectrum.objects.select_related('prediction').defer('preview_wavelengths', 'preview_intensities').order_by('-timestamp')
+        serializer = SpectrumDetailSerializer(spectra, many=True)
+        response = Response(serializer.data)
+
+    # Cacheable, but revalidated on every load so new uploads show up at once
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def parse_resolution(params):
+    """
+    Reads the points / min_wavelength / max_wavelength query parameters of spectrum_detail.
+    Returns None if no resolution was requested. Raises ValueError on malformed values.
+    """
+    if "points" not in params:
+        return None
+    try:
+        points = int(params["points"])
+    except ValueError:
+        raise ValueError("'points' must be an integer")
+    if points < 3:
+        raise ValueError("'points' must be at least 3")
+
+    window = []
+    for param in ("min_wavelength", "max_wavelength"):
+        value = params.get(param)
+        try:
+            window.append(float(value) if value else None)
+        except ValueError:
+            raise ValueError(f"'{param}' must be a number")
+    return min(points, MAX_PREVIEW_POINTS), *window
+
+
+# group_by value -> the columns whose values form a group
+STATS_GROUPINGS = {
+    "device_id": ('device_id',),
+    "device": ('device',),
+    "settings": ('gain', 'apodization', 'averages'),
+}
+
+
+@condition(etag_func=listing_etag, last_modified_func=listing_last_modified)
+@api_view(['GET'])
+def spectra_stats(request):
+    """
+    Per-wavelength mean / std / min / max and prediction statistics for each group of the
+    spectra matching the listing filters. group_by is device_id (the raw tag, default),
+    device, or settings (gain, apodization and averages). Only the aggregated arrays are
+    returned.
+
+    At most "limit" spectra are aggregated, newest first. "count" says how many were, and
+    "truncated" is true if more matched; narrow the filters (e.g. since / until) to cover them.
+    """
+    group_by = request.query_params.get("group_by", "device_id")
+    if group_by not in STATS_GROUPINGS:
+        return Response({"error": f"'group_by' must be one of {', '.join(STATS_GROUPINGS)}"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = int(request.query_params.get("limit", DEFAULT_STATS_LIMIT))
+    except ValueError:
+        return Response({"error": "'limit' must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, MAX_STATS_LIMIT))
+    try:
+        queryset = filter_spectra(Spectrum.objects.all(), request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    group_fields = STATS_GROUPINGS[group_by]
+    groups = {}
+    # One extra row tells whether the limit cut the aggregation short
+    rows = queryset.order_by('-timestamp', '-id').values_list(
+        *group_fields, 'wavelengths', 'intensities', 'prediction__predicted_value'
+    )[:limit + 1]
+    count = 0
+    truncated = False
+    for *key, wavelengths, intensities, predicted_value in rows.iterator(chunk_size=STATS_CHUNK_SIZE):
+        if count == limit:
+            truncated = True
+            break
+        groups.setdefault(tuple(key), SpectrumAccumulator()).add(wavelengths, intensities, predicted_value)
+        count += 1
+
+    response = Response({
+        "group_by": group_by,
+        "count": count,
+        "truncated": truncated,
+        "groups": [
+            {"key": key[0] if len(group_fields) == 1 else dict(zip(group_fields, key)), **accumulator.summary()}
+            for key, accumulator in groups.items()
+        ],
+    })
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def cacheable(response):
+    # 304s carry no Cache-Control, so caches keep the one stored with the original 200
+    patch_cache_control(response, public=True, max_age=SPECTRUM_DETAIL_MAX_AGE)
+    return response
+
+
+def detail_state(request, spectrum_id):
+    """
+    Returns (last modified, ETag) for one spectrum, or (None, None) if it does not exist.
+    Only the prediction can change after upload.
+    """
+    state = getattr(request, "_detail_state", None)
+    if state is None:
+        row = Spectrum.objects.filter(id=spectrum_id).values('timestamp', 'prediction__updated_at').first()
+        if row is None:
+            state = (None, None)
+        else:
+            updated = row['prediction__updated_at']
+            etag = query_fingerprint(request, spectrum_id, updated)
+            state = (max(filter(None, (row['timestamp'], updated))), etag)
+        request._detail_state = state
+    return state
+
+
+def detail_last_modified(request, spectrum_id):
+    return detail_state(request, spectrum_id)[0]
+
+
+def detail_etag(request, spectrum_id):
+    return detail_state(request, spectrum_id)[1]
+
+
+@condition(etag_func=detail_etag, last_modified_func=detail_last_modified)
+@api_view(['GET'])
+def spectrum_detail(request, spectrum_id):
+    """
+    Returns the full point data, or with ?points=N at most N points picked by LTTB. Requests
+    of up to PREVIEW_POINTS over the whole range are served from the preview stored at upload;
+    min_wavelength / max_wavelength zoom into a window of the full data instead.
+    """
+    try:
+        resolution = parse_resolution(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    queryset = Spectrum.objects.select_related('prediction')
+    if resolution is None:
+        spectrum = get_object_or_404(queryset.defer('preview_wavelengths', 'preview_intensities'), id=spectrum_id)
+        return cacheable(Response(SpectrumDetailSerializer(spectrum).data))
+
+    points, min_wavelength, max_wavelength = resolution
+    from_preview = points <= PREVIEW_POINTS and min_wavelength is None and max_wavelength is None
+    if from_preview:
+        spectrum = get_object_or_404(queryset.defer('wavelengths', 'intensities'), id=spectrum_id)
+        # Rows stored before previews existed fall back to the full arrays
+        source = (spectrum.preview_wavelengths, spectrum.preview_intensities) if spectrum.preview_wavelengths \
+            else (spectrum.wavelengths, spectrum.intensities)
+    else:
+        spectrum = get_object_or_404(queryset.defer('preview_wavelengths', 'preview_intensities'), id=spectrum_id)
+        source = (spectrum.wavelengths, spectrum.intensities)
+
+    wavelengths, intensities = downsample(to_array(source[0]), to_array(source[1]), points, min_wavelength, max_wavelength)
+    return cacheable(Response({
+        **SpectrumPreviewSerializer(spectrum).data,
+        "wavelengths": wavelengths.tolist(),
+        "intensities": intensities.tolist(),
+        "downsampled": len(wavelengths) < spectrum.num_points,
+    }))
+
+
+def build_settings(data, device_id):
+    """
+    The acquisition-settings columns for an upload: parsed from the device_id tag, overridden
+    by any settings sent explicitly. Raises ValueError on a malformed setting.
+    """
+    fields = acquisition_fields(device_id)
+    for field in ("device", "gain", "apodization", "note"):
+        value = data.get(field)
+        if value is None:
+            continue
+        if not isinstance(value, str) or len(value) > Spectrum._meta.get_field(field).max_length:
+            raise ValueError(f"Invalid {field}")
+        fields[field] = value
+
+    averages = data.get("averages")
+    if averages is not None:
+        if isinstance(averages, bool) or not isinstance(averages, int) or not 0 <= averages <= MAX_AVERAGES:
+            raise ValueError("Invalid averages")
+        fields["averages"] = averages
+
+    saturation = data.get("saturation")
+    if saturation is not None:
+        if isinstance(saturation, bool) or not isinstance(saturation, (int, float)) or not math.isfinite(saturation):
+            raise ValueError("Invalid saturation")
+        fields["saturation"] = float(saturation)
+    return fields
+
+
+def is_finite_numbers(values):
+    """True for a non-empty list (or the array the binary parser decodes) of finite numbers."""
+    if not isinstance(values, (list, array)) or not values:
+        return False
+    try:
+        return all(isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v) for v in values)
+    except OverflowError:
+        return False
+
+
+def build_spectrum(data):
+    """
+    Validates one uploaded spectrum payload and returns an unsaved Spectrum.
+    Raises ValueError describing the problem if the payload is invalid.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Expected an object")
+    wavelengths = data.get("wavelengths")
+    intensities = data.get("intensities")
+    device_id = data.get("device_id", "unknown")
+    spectrum_id = data.get("id")
+
+    if not is_finite_numbers(wavelengths) or not is_finite_numbers(intensities) \
+            or len(wavelengths) != len(intensities):
+        raise ValueError("Invalid spectrum data")
+    if not isinstance(device_id, str) or len(device_id) > Spectrum._meta.get_field('device_id').max_length:
+        raise ValueError("Invalid device_id")
+    if spectrum_id is not None:
+        # Client-chosen id, so a retried upload can be recognised instead of stored twice
+        try:
+            spectrum_id = uuid.UUID(spectrum_id) if isinstance(spectrum_id, str) else None
+        except ValueError:
+            spectrum_id = None
+        if spectrum_id is None:
+            raise ValueError("Invalid id")
+
+    packed_wavelengths = pack_floats(wavelengths)
+    packed_intensities = pack_floats(intensities)
+
+    preview_wavelengths, preview_intensities = preview_blobs(packed_wavelengths, packed_intensities)
+
+    # One row per spectrum, with the point data packed into two blobs
+    return Spectrum(
+        **({"id": spectrum_id} if spectrum_id is not None else {}),
+        device_id=device_id,
+        **build_settings(data, device_id),
+        wavelengths=packed_wavelengths,
+        intensities=packed_intensities,
+        num_points=len(wavelengths),
+        preview_wavelengths=preview_wavelengths,
+        preview_intensities=preview_intensities,
+    )
+
+
+def build_prediction(spectrum, data):
+    """
+    Returns an unsaved Prediction for the optional predicted_value / model_version sent
+    alongside a spectrum, or None if no value was sent.
+    Raises ValueError if either field is malformed.
+    """
+    value = data.get("predicted_value")
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError("Invalid predicted_value")
+
+    model_version = data.get("model_version") or ""
+    if not isinstance(model_version, str) or len(model_version) > Prediction._meta.get_field('model_version').max_length:
+        raise ValueError("Invalid model_version")
+
+    return Prediction(
+        spectrum=spectrum,
+        device_id=spectrum.device_id,
+        predicted_value=float(value),
+        model_version=model_version,
+    )
+
+
+def link_calibrations(predictions):
+    """Points device-supplied predictions at the registered calibration their model_version names."""
+    ids = registered_versions(prediction.model_version for prediction in predictions)
+    for prediction in predictions:
+        prediction.calibration_id = ids.get(prediction.model_version)
+
+
+def score_on_upload(spectra):
+    """
+    Server-side Predictions for uploaded spectra that arrived without one. Returns one
+    Prediction or None per spectrum; all None if upload scoring is off or unconfigured.
+    """
+    calibration = active_calibration() if settings.PREDICT_ON_UPLOAD else None
+    if calibration is None:
+        return [None] * len(spectra)
+    return [
+        None if value is None else Prediction(
+            spectrum=spectrum,
+            device_id=spectrum.device_id,
+            predicted_value=value,
+            model_version=calibration.version,
+            calibration_id=calibration.model_id,
+            source=Prediction.SOURCE_SERVER,
+        )
+        for spectrum, value in zip(spectra, score_spectra(calibration, spectra))
+    ]
 
 
 @api_view(['POST'])
+@parser_classes([JSONParser, SpectrumBinaryParser])
 def upload_spectrum(request):
-    wavelengths = request.data.get("wavelengths")
-    intensities = request.data.get("intensities")
-    device_id = request.data.get("device_id", "unknown")
+    """
+    Stores one spectrum. If predicted_value (and optionally model_version) is sent with it,
+    the Prediction is created in the same transaction so neither exists without the other;
+    otherwise the server's calibration scores it, if one is configured.
 
-    if not wavelengths or not intensities or len(wavelengths) != len(intensities):
-        return Response({"error": "Invalid spectrum data"}, status=status.HTTP_400_BAD_REQUEST)
+    If the payload carries an "id" that is already stored (a retry of an upload that went
+    through), nothing is inserted and the existing id is returned with status 200.
+    """
+    try:
+        spectrum = build_spectrum(request.data)
+        prediction = build_prediction(spectrum, request.data)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Save the Spectrum metadata
-    spectrum = Spectrum.objects.create(device_id=device_id)
+    duplicate = Response({
+        "message": "Spectrum already uploaded",
+        "spectrum_id": str(spectrum.id),
+        "duplicate": True,
+    }, status=status.HTTP_200_OK)
+    if request.data.get("id") is not None and Spectrum.objects.filter(pk=spectrum.id).exists():
+        return duplicate
 
-    # Prepare data point objects
-    data_points = [
-        SpectrumDataPoint(spectrum=spectrum, wavelength=w, intensity=i)
-        for w, i in zip(wavelengths, intensities)
-    ]
+    if prediction is not None:
+        link_calibrations([prediction])
+    else:
+        prediction = score_on_upload([spectrum])[0]
 
-    # Bulk insert for speed
-    SpectrumDataPoint.objects.bulk_create(data_points)
+    try:
+        with transaction.atomic():
+            spectrum.save()
+            if prediction is not None:
+                prediction.save()
+    except IntegrityError:
+        if not Spectrum.objects.filter(pk=spectrum.id).exists():
+            raise
+        return duplicate  # the same id was inserted concurrently
 
     return Response({
         "message": "Spectrum uploaded",
         "spectrum_id": str(spectrum.id),
-        "points_saved": len(data_points)
+        "points_saved": spectrum.num_points,
+        "prediction_saved": prediction is not None,
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+def upload_spectra_batch(request):
+    """
+    Bulk ingest: accepts a list of spectrum payloads (or {"spectra": [...]}), each optionally
+    carrying a predicted_value and model_version. Valid items are inserted in one transaction with two bulk
+    inserts; invalid items are reported individually and do not block the rest. Items whose
+    "id" is already stored are reported with that id and "duplicate": true, not inserted again.
+    """
+    items = request.data.get("spectra") if isinstance(request.data, dict) else request.data
+    if not isinstance(items, list) or not items:
+        return Response({"error": "Expected a non-empty list of spectra"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > MAX_BATCH_SIZE:
+        return Response({"error": f"At most {MAX_BATCH_SIZE} spectra per request"}, status=status.HTTP_400_BAD_REQUEST)
+
+    results = []
+    built = []
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("Expected an object")
+            spectrum = build_spectrum(item)
+            prediction = build_prediction(spectrum, item)
+        except ValueError as e:
+            results.append({"index": index, "error": str(e)})
+            continue
+        built.append((index, spectrum, prediction, item.get("id") is not None))
+
+    if not built:
+        return Response({"error": "No valid spectra", "results": results}, status=status.HTTP_400_BAD_REQUEST)
+
+    client_ids = [spectrum.id for _, spectrum, _, has_id in built if has_id]
+    stored = set(Spectrum.objects.filter(pk__in=client_ids).values_list('pk', flat=True)) if client_ids else set()
+
+    spectra = []
+    predictions = []
+    unscored = []
+    duplicates = 0
+    for index, spectrum, prediction, _ in built:
+        if spectrum.id in stored:
+            duplicates += 1
+            results.append({"index": index, "spectrum_id": str(spectrum.id), "duplicate": True})
+            continue
+        stored.add(spectrum.id)
+        spectra.append(spectrum)
+        if prediction is not None:
+            predictions.append(prediction)
+        else:
+            unscored.append(spectrum)
+        results.append({"index": index, "spectrum_id": str(spectrum.id)})
+    results.sort(key=lambda result: result["index"])
+
+    link_calibrations(predictions)
+    predictions += [prediction for prediction in score_on_upload(unscored) if prediction is not None]
+
+    try:
+        with transaction.atomic():
+            Spectrum.objects.bulk_create(spectra)
+            Prediction.objects.bulk_create(predictions)
+    except IntegrityError:
+        # Another request stored one of these ids meanwhile; a retry reports it as a duplicate
+        return Response({"error": "Conflicting upload, retry"}, status=status.HTTP_409_CONFLICT)
+
+    return Response({
+        "message": "Spectra uploaded",
+        "created": len(spectra),
+        "duplicates": duplicates,
+        "predictions_saved": len(predictions),
+        "failed": len(items) - len(built),
+        "results": results,
     }, status=status.HTTP_201_CREATED)
-    
+
+
+def rescore_chunk(calibration, spectra):
+    """
+    Scores a chunk of spectra in one vectorized pass and upserts their predictions.
+    Returns how many predictions were written.
+    """
+    existing = {prediction.spectrum_id: prediction for prediction in Prediction.objects.filter(spectrum__in=spectra)}
+    now = timezone.now()
+    created, updated = [], []
+    for spectrum, value in zip(spectra, score_spectra(calibration, spectra)):
+        if value is None:
+            continue
+        prediction = existing.get(spectrum.id)
+        if prediction is None:
+            created.append(Prediction(
+                spectrum=spectrum,
+                device_id=spectrum.device_id,
+                predicted_value=value,
+                model_version=calibration.version,
+                calibration_id=calibration.model_id,
+                source=Prediction.SOURCE_SERVER,
+            ))
+        else:
+            prediction.predicted_value = value
+            prediction.model_version = calibration.version
+            prediction.calibration_id = calibration.model_id
+            prediction.source = Prediction.SOURCE_SERVER
+            prediction.updated_at = now
+            updated.append(prediction)
+
+    with transaction.atomic():
+        Prediction.objects.bulk_create(created)
+        # bulk_update skips auto_now, so updated_at is set above
+        Prediction.objects.bulk_update(updated, ['predicted_value', 'model_version', 'calibration', 'source', 'updated_at'])
+    return len(created) + len(updated)
+
+
+@api_view(['POST'])
+def rescore_spectra(request):
+    """
+    Recomputes predictions with the active calibration for the spectra matching the
+    device_id / since / until filters in the body. Only predictions that are missing or
+    came from another calibration are touched, unless "force" is set; with "missing_only"
+    set, existing predictions are left alone entirely.
+
+    Each call handles at most "limit" spectra, oldest first. While "has_more" is true, call
+    again with the returned "next_cursor" to continue where this call stopped.
+    """
+    calibration = active_calibration()
+    if calibration is None:
+        return Response({"error": "No active calibration"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    try:
+        limit = int(request.data.get("limit", DEFAULT_RESCORE_LIMIT))
+    except (TypeError, ValueError):
+        return Response({"error": "'limit' must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, MAX_RESCORE_LIMIT))
+
+    try:
+        queryset = filter_spectra(Spectrum.objects.all(), request.data)
+        cursor = request.data.get("cursor")
+        if cursor:
+            last_timestamp, last_id = decode_cursor(str(cursor))
+            queryset = queryset.filter(
+                Q(timestamp__gt=last_timestamp) | Q(timestamp=last_timestamp, id__gt=last_id)
+            )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if request.data.get("missing_only"):
+        queryset = queryset.filter(prediction__isnull=True)
+    elif not request.data.get("force"):
+        queryset = queryset.exclude(prediction__calibration_id=calibration.model_id)
+
+    # One extra row tells whether another call is needed
+    rows = list(queryset.order_by('timestamp', 'id').values_list('id', 'timestamp')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    spectrum_ids = [spectrum_id for spectrum_id, _ in rows]
+    rescored = 0
+    for start in range(0, len(spectrum_ids), RESCORE_CHUNK_SIZE):
+        chunk = list(
+            Spectrum.objects
+            .filter(id__in=spectrum_ids[start:start + RESCORE_CHUNK_SIZE])
+            .only('id', 'device_id', 'wavelengths', 'intensities', 'num_points')
+        )
+        rescored += rescore_chunk(calibration, chunk)
+
+    return Response({
+        "matched": len(spectrum_ids),
+        "rescored": rescored,
+        "model_version": calibration.version,
+        "has_more": has_more,
+        "next_cursor": encode_cursor(rows[-1][1], rows[-1][0]) if has_more else None,
+    })
+
+
+def server_scored_prediction(spectrum_id):
+    """
+    The spectrum's existing Prediction if the server computed it (scored on upload or
+    rescored), which a device-computed value may replace; otherwise None.
+    """
+    try:
+        return Prediction.objects.filter(spectrum_id=spectrum_id, source=Prediction.SOURCE_SERVER).first()
+    except (ValueError, ValidationError):
+        return None  # the serializer reports the malformed id
+
 
 @api_view(['POST'])
 def upload_prediction(request):
-    serializer = PredictionSerializer(data=request.data)
+    """
+    Stores a device-computed prediction for an uploaded spectrum. If the server already
+    scored the spectrum (PREDICT_ON_UPLOAD), the device's value replaces that prediction.
+    """
+    spectrum_id = request.data.get("spectrum") if isinstance(request.data, dict) else None
+    existing = server_scored_prediction(spectrum_id) if spectrum_id else None
+    serializer = PredictionSerializer(existing, data=request.data)
     if serializer.is_valid():
-        serializer.save()
+        model_version = serializer.validated_data.get("model_version") or ""
+        calibration_id = registered_versions([model_version]).get(model_version)
+        serializer.save(calibration_id=calibration_id, source=Prediction.SOURCE_DEVICE)
         return Response({"message": "Prediction saved."}, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
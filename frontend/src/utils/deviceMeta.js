@@ -9,3 +9,16 @@ export function parseDeviceMeta(str = "") {
 
   return { deviceName, gain, avg, msg };
 }
+
+// Prefer the structured settings stored by the API; older rows only have the device_id tag
+export function spectrumMeta(spectrum = {}) {
+  const parsed = parseDeviceMeta(spectrum.device_id ?? "");
+  return {
+    deviceName: spectrum.device || parsed.deviceName,
+    gain: spectrum.gain || parsed.gain,
+    avg: spectrum.averages ?? parsed.avg,
+    msg: spectrum.note || parsed.msg,
+    apodization: spectrum.apodization || null,
+    saturation: spectrum.saturation ?? null,
+  };
+}
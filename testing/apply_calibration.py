@@ -1,7 +1,11 @@
+import os
+import sys
 import psycopg2
 import numpy as np
-import pandas as pd
-from scipy.interpolate import interp1d
+
+# Share the device's calibration code instead of keeping a copy here
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "aodaq", "client"))
+from calibration import apply_calibrated_model, apply_calibrated_model_batch  # noqa: E402
 
 DB_HOST = "database-1.cv6ic62me1li.us-east-1.rds.amazonaws.com"
 DB_PORT = "5432"
@@ -24,20 +28,24 @@ def fetch_spectrum_data(device_id, spectrum_id=None):
 
         if spectrum_id:
             cursor.execute("""
-                SELECT d.wavelength, d.intensity
-                FROM core_spectrumdatapoint d
-                JOIN core_spectrum s ON d.spectrum_id = s.id
+                SELECT s.wavelengths, s.intensities
+                FROM core_spectrum s
                 WHERE s.device_id = %s AND s.id = %s;
             """, (device_id, spectrum_id))
         else:
             cursor.execute("""
-                SELECT d.wavelength, d.intensity
-                FROM core_spectrumdatapoint d
-                JOIN core_spectrum s ON d.spectrum_id = s.id
+                SELECT s.wavelengths, s.intensities
+                FROM core_spectrum s
                 WHERE s.device_id = %s;
             """, (device_id,))
 
-        data = cursor.fetchall()
+        # Each spectrum is stored as two packed little-endian float64 arrays
+        data = []
+        for wavelengths, intensities in cursor.fetchall():
+            data.extend(zip(
+                np.frombuffer(wavelengths, dtype="<f8").tolist(),
+                np.frombuffer(intensities, dtype="<f8").tolist(),
+            ))
         cursor.close()
         connection.close()
         return data
@@ -46,48 +54,38 @@ def fetch_spectrum_data(device_id, spectrum_id=None):
         return []
 
 
-def load_calibration_csv(path):
-    df = pd.read_csv(path, header=None, names=["wavelength", "coefficient", "constant"])
-
-    # Keep rows where coefficient is not NaN
-    df = df[pd.notnull(df["coefficient"])]
-    calib_wavelengths = df["wavelength"].to_numpy(dtype=float)
-    calib_coeffs = df["coefficient"].to_numpy(dtype=float)
-
-    # Grab the first available constant
-    constant_row = pd.read_csv(path, header=None, names=["wavelength", "coefficient", "constant"])
-    calib_const = constant_row["constant"].dropna().iloc[0]
-
-    return calib_wavelengths, calib_coeffs, calib_const
-
-
-def interpolate_spectrum(raw_wavelengths, raw_intensities, target_wavelengths):
-    interpolator = interp1d(raw_wavelengths, raw_intensities, bounds_error=False, fill_value="extrapolate")
-    return interpolator(target_wavelengths)
-
-
-def snv(x):
-    x = np.asarray(x, dtype=float)
-    x = np.nan_to_num(x, nan=0.0, posinf=0.0, neginf=0.0)
-    mu = np.nanmean(x)
-    sigma = np.nanstd(x)
-    if sigma == 0 or np.isnan(sigma):
-        return np.zeros_like(x)
-    return (x - mu) / sigma
-
-
-def apply_calibrated_model(raw_spectrum, calib_path):
-    raw_wavelengths, raw_intensities = zip(*raw_spectrum)
-    raw_wavelengths = np.array(raw_wavelengths)
-    raw_intensities = np.array(raw_intensities)
+def fetch_device_spectra(device_id):
+    """Fetches every spectrum for a device as a list of (M x 2) arrays, one per spectrum."""
+    try:
+        connection = psycopg2.connect(
+            host=DB_HOST,
+            port=DB_PORT,
+            dbname=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD
+        )
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT s.wavelengths, s.intensities
+            FROM core_spectrum s
+            WHERE s.device_id = %s AND s.num_points > 1;
+        """, (device_id,))
+
+        spectra = [
+            np.column_stack((np.frombuffer(w, dtype="<f8"), np.frombuffer(i, dtype="<f8")))
+            for w, i in cursor.fetchall()
+        ]
+        cursor.close()
+        connection.close()
+        return spectra
+    except Exception as e:
+        print(f"Error fetching data: {e}")
+        return []
 
-    calib_wavelengths, calib_coeffs, calib_const = load_calibration_csv(calib_path)
-    aligned_intensities = interpolate_spectrum(raw_wavelengths, raw_intensities, calib_wavelengths)
-    aligned_intensities = snv(aligned_intensities)
 
-    predicted_value = np.dot(aligned_intensities, calib_coeffs) + calib_const
-    predicted_value *= 0.1 # Assuming we are expecting ~4.18 instead of ~41.8
-    return predicted_value
+def rescore_device(device_id, calib_path):
+    """Re-scores every spectrum of a device in one vectorized batch."""
+    return apply_calibrated_model_batch(fetch_device_spectra(device_id), calib_path)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,98 @@
+"""
+Checks that the server's LinearCalibration (backend/api/core/prediction.py) and the device's
+CalibrationModel (aodaq/client/calibration.py) give the same model version and the same SOC
+for the same calibration and spectra. The backend keeps its own numpy-only copy of the
+maths so the Lambda package stays small; run this after changing either side.
+
+    python check_prediction_parity.py --trials 50
+"""
+import os
+import sys
+import argparse
+import tempfile
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "aodaq", "client"))
+sys.path.insert(0, os.path.join(HERE, "..", "backend", "api"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+
+import django  # noqa: E402
+django.setup()  # core.prediction imports the models; no database connection is made
+
+from calibration import CalibrationModel  # noqa: E402
+from core.prediction import LinearCalibration  # noqa: E402
+
+RTOL = 1e-9
+ATOL = 1e-9
+
+
+def write_calibration(path, rng, num_coeffs):
+    wavelengths = np.sort(rng.uniform(1300.0, 2500.0, num_coeffs))
+    coefficients = rng.normal(size=num_coeffs)
+    constant = rng.normal()
+    with open(path, "w") as f:
+        for i, (wl, coeff) in enumerate(zip(wavelengths, coefficients)):
+            f.write(f"{float(wl)!r},{float(coeff)!r},{repr(float(constant)) if i == 0 else ''}\n")
+
+
+def random_grid(rng, points):
+    """A source grid that may extend past the calibration range, be unsorted or repeat values."""
+    grid = np.linspace(rng.uniform(1200.0, 1400.0), rng.uniform(2400.0, 2600.0), points)
+    style = rng.integers(4)
+    if style == 1:
+        grid = grid[::-1].copy()
+    elif style == 2:
+        grid = rng.permutation(grid)
+    elif style == 3:
+        grid[points // 2] = grid[points // 2 - 1]
+    return grid
+
+
+def check(trials, seed):
+    rng = np.random.default_rng(seed)
+    failures = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for trial in range(trials):
+            path = os.path.join(workdir, f"calibration_{trial}.csv")
+            write_calibration(path, rng, int(rng.integers(5, 300)))
+            client = CalibrationModel.from_csv(path)
+            server = LinearCalibration.from_csv(path)
+            if client.version != server.version:
+                failures.append(f"trial {trial}: version {client.version} != {server.version}")
+
+            spectra = []
+            for _ in range(int(rng.integers(1, 6))):
+                grid = random_grid(rng, int(rng.integers(10, 500)))
+                for _ in range(int(rng.integers(1, 4))):
+                    intensities = rng.uniform(0.0, 1.0, len(grid)) * rng.uniform(0.1, 100.0)
+                    spectra.append((grid, intensities))
+
+            expected = np.array([client.predict(np.column_stack(s)) for s in spectra])
+            results = {
+                "predict": np.array([server.predict(*s) for s in spectra]),
+                "predict_batch": server.predict_batch(spectra),
+                "client predict_batch": client.predict_batch([np.column_stack(s) for s in spectra]),
+            }
+            for name, values in results.items():
+                if not np.allclose(values, expected, rtol=RTOL, atol=ATOL):
+                    worst = float(np.max(np.abs(values - expected)))
+                    failures.append(f"trial {trial}: {name} differs from client predict by up to {worst:.3g}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare client and server SOC predictions")
+    parser.add_argument("--trials", type=int, default=50, help="Random calibrations to check")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    failures = check(args.trials, args.seed)
+    for failure in failures:
+        print(failure)
+    print(f"{args.trials} calibrations checked, {len(failures)} mismatches")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
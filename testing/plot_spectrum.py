@@ -26,20 +26,24 @@ def fetch_spectrum_data(device_id, spectrum_id=None):
 
         if spectrum_id:
             cursor.execute("""
-                SELECT d.wavelength, d.intensity
-                FROM core_spectrumdatapoint d
-                JOIN core_spectrum s ON d.spectrum_id = s.id
+                SELECT s.wavelengths, s.intensities
+                FROM core_spectrum s
                 WHERE s.device_id = %s AND s.id = %s;
             """, (device_id, spectrum_id))
         else:
             cursor.execute("""
-                SELECT d.wavelength, d.intensity
-                FROM core_spectrumdatapoint d
-                JOIN core_spectrum s ON d.spectrum_id = s.id
+                SELECT s.wavelengths, s.intensities
+                FROM core_spectrum s
                 WHERE s.device_id = %s;
             """, (device_id,))
 
-        data = cursor.fetchall()
+        # Each spectrum is stored as two packed little-endian float64 arrays
+        data = []
+        for wavelengths, intensities in cursor.fetchall():
+            data.extend(zip(
+                np.frombuffer(wavelengths, dtype="<f8").tolist(),
+                np.frombuffer(intensities, dtype="<f8").tolist(),
+            ))
         cursor.close()
         connection.close()
         return data
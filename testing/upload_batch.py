@@ -0,0 +1,31 @@
+import sys
+import json
+import requests
+
+input_json_file = sys.argv[1] if len(sys.argv) > 1 else 'payload_csiro.json'
+api_url = "https://rekehtm1f0.execute-api.us-east-1.amazonaws.com/dev/upload-spectra/"
+batch_size = 200  # the API accepts at most 500 spectra per request
+
+with open(input_json_file, encoding='utf-8') as f:
+    spectrum_data_list = json.load(f)
+
+session = requests.Session()
+created = failed = 0
+
+for start in range(0, len(spectrum_data_list), batch_size):
+    batch = spectrum_data_list[start:start + batch_size]
+    response = session.post(api_url, json=batch)
+    body = response.json()
+
+    for result in body.get("results", []):
+        if "error" in result:
+            failed += 1
+            print(f"Spectrum {start + result['index']} rejected: {result['error']}")
+        else:
+            created += 1
+
+    if "results" not in body:
+        failed += len(batch)
+        print(f"Batch starting at {start} failed: {response.status_code} {response.text}")
+
+print(f"✅ Uploaded {created} spectra from '{input_json_file}' ({failed} failed).")